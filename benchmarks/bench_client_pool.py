@@ -0,0 +1,70 @@
+"""
+bench_client_pool.py — Cold Groq client per call vs the pooled shared client.
+Runs against the local fake backend, so it needs no credentials:
+
+    python -m benchmarks.bench_client_pool --requests 200 --threads 8
+"""
+
+import argparse
+import os
+import statistics
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from benchmarks.fake_groq import start_server
+
+MESSAGES = [{"role": "user", "content": "ping"}]
+
+
+def _percentile(values: list[float], pct: float) -> float:
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, int(round(pct / 100 * (len(ordered) - 1))))
+    return ordered[index]
+
+
+def _timed_call(make_client) -> float:
+    started = time.perf_counter()
+    client = make_client()
+    client.chat.completions.create(model="fake-model", messages=MESSAGES, max_tokens=16)
+    return time.perf_counter() - started
+
+
+def run(label: str, make_client, requests: int, threads: int):
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=threads) as pool:
+        latencies = list(pool.map(lambda _: _timed_call(make_client), range(requests)))
+    wall = time.perf_counter() - started
+    print(f"{label:<8} mean={statistics.mean(latencies) * 1000:7.2f}ms  "
+          f"p50={_percentile(latencies, 50) * 1000:7.2f}ms  p95={_percentile(latencies, 95) * 1000:7.2f}ms  "
+          f"throughput={requests / wall:8.1f} req/s")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--requests", type=int, default=200)
+    parser.add_argument("--threads", type=int, default=8)
+    parser.add_argument("--latency", type=float, default=0.0, help="Fake server think time in seconds")
+    args = parser.parse_args()
+
+    server = start_server(latency=args.latency)
+    os.environ["GROQ_API_KEY"] = "fake-key"
+    os.environ["GROQ_BASE_URL"] = server.base_url
+
+    from groq import Groq
+    from modules.llm_engine import get_client
+
+    def cold_client():
+        return Groq(api_key="fake-key", base_url=server.base_url)
+
+    # Warm up both paths once so imports and the pool's first connect aren't measured
+    _timed_call(cold_client)
+    _timed_call(get_client)
+
+    print(f"{args.requests} requests, {args.threads} threads, fake latency {args.latency * 1000:.0f}ms")
+    run("cold", cold_client, args.requests, args.threads)
+    run("pooled", get_client, args.requests, args.threads)
+    server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,109 @@
+"""
+bench_e2e.py — End-to-end latency/throughput of every StudyBuddy feature.
+Drives the real module entry points against the deterministic fake backend
+with the response cache off, so numbers reflect the full request path
+(prompt building, budgeting, rate limiting, parsing).
+
+    python -m benchmarks.bench_e2e --iterations 20 --concurrency 4 --latency 0.2 --token-rate 400
+"""
+
+import argparse
+import io
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from benchmarks.fake_groq import start_server
+
+NOTES = " ".join(
+    f"Paragraph {i}. Cells convert energy through respiration, and enzymes speed up each reaction step."
+    for i in range(60)
+)
+
+
+def _percentile(values: list[float], pct: float) -> float:
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(pct / 100 * len(ordered)))]
+
+
+def _scenarios() -> dict:
+    from modules.chat_tutor import get_tutor_response
+    from modules.explainer import explain_topic, explain_topic_stream, LEVELS
+    from modules.flashcard_generator import generate_flashcards
+    from modules.llm_engine import transcribe_audio
+    from modules.quiz_generator import generate_quiz
+    from modules.summarizer import summarize_notes
+
+    levels = list(LEVELS)
+
+    def first_token(i):
+        stream = explain_topic_stream(f"Streamed topic {i}", levels[i % len(levels)])
+        next(stream)
+        stream.close()
+
+    # Each call uses a distinct input so the topic index and single-flight don't short-circuit it
+    return {
+        "explain_topic": lambda i: explain_topic(f"Topic number {i}", levels[i % len(levels)]),
+        "explain_ttft": first_token,
+        "summarize_notes": lambda i: summarize_notes(f"Lecture {i}. {NOTES}"),
+        "generate_quiz": lambda i: generate_quiz(f"Chapter {i}", 5, ["MCQ", "True/False", "Short Answer"][i % 3]),
+        "generate_flashcards": lambda i: generate_flashcards(f"Deck {i}", 8),
+        "get_tutor_response": lambda i: get_tutor_response(f"Question {i}?", []),
+        "transcribe_audio": lambda i: transcribe_audio(io.BytesIO(b"RIFF" + bytes(i))),
+    }
+
+
+def _timed(fn, i) -> tuple[float, Exception | None]:
+    started = time.perf_counter()
+    try:
+        fn(i)
+        return time.perf_counter() - started, None
+    except Exception as e:
+        return time.perf_counter() - started, e
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--iterations", type=int, default=20, help="Calls per feature")
+    parser.add_argument("--concurrency", type=int, default=4)
+    parser.add_argument("--latency", type=float, default=0.2, help="Fake time to first byte (s)")
+    parser.add_argument("--token-rate", type=float, default=400, help="Fake words per second")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="Fraction of 503 responses")
+    parser.add_argument("--only", nargs="*", help="Run just these scenarios")
+    args = parser.parse_args()
+
+    server = start_server(latency=args.latency, token_rate=args.token_rate, error_rate=args.error_rate)
+    os.environ["GROQ_BASE_URL"] = server.base_url
+    os.environ.pop("GROQ_API_KEY", None)
+    os.environ["LLM_CACHE_DISABLED"] = "1"
+    os.environ.setdefault("LLM_TRACE_PATH", "")
+    # Measure our own overhead, not the free-tier budget
+    os.environ.setdefault("GROQ_RPM", "100000")
+    os.environ.setdefault("GROQ_TPM", "100000000")
+    os.environ.setdefault("GROQ_WHISPER_RPM", "100000")
+
+    scenarios = _scenarios()
+    print(f"fake backend: latency={args.latency}s token_rate={args.token_rate}/s error_rate={args.error_rate}  "
+          f"iterations={args.iterations} concurrency={args.concurrency}")
+    print(f"{'scenario':<22}{'ok':>5}{'err':>5}{'req/s':>9}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}")
+    for name, fn in scenarios.items():
+        if args.only and name not in args.only:
+            continue
+        started = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=args.concurrency) as pool:
+            results = list(pool.map(lambda i: _timed(fn, i), range(args.iterations)))
+        wall = time.perf_counter() - started
+        latencies = [t for t, err in results if err is None]
+        errors = [err for _, err in results if err is not None]
+        if latencies:
+            print(f"{name:<22}{len(latencies):>5}{len(errors):>5}{len(results) / wall:>9.1f}"
+                  f"{_percentile(latencies, 50) * 1000:>10.1f}{_percentile(latencies, 95) * 1000:>10.1f}"
+                  f"{_percentile(latencies, 99) * 1000:>10.1f}")
+        else:
+            print(f"{name:<22}{0:>5}{len(errors):>5}  all failed: {errors[0]!r}")
+    print(f"server stats: {server.stats}")
+    server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,96 @@
+"""
+bench_pdf_backends.py — Compare the PDF extraction backends in pdf_backends.
+Each installed backend extracts every fixture in a fresh process, reporting
+pages/sec, that process's peak resident memory and text fidelity (word-level
+similarity to the text the fixture was generated from). Extra real documents
+can be added with --pdf; fidelity is not scored for those.
+
+    python -m benchmarks.bench_pdf_backends --pages 20 200 --pdf textbook.pdf
+"""
+
+import argparse
+import difflib
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import time
+
+try:
+    import resource
+except ImportError:  # Windows: peak memory is not reported
+    resource = None
+
+
+def _fidelity(expected: list[str], actual: list[str]) -> float:
+    """Mean word-sequence similarity per page (1.0 = identical words in the same order)."""
+    scores = []
+    for want, got in zip(expected, actual):
+        matcher = difflib.SequenceMatcher(None, want.split(), got.split(), autojunk=False)
+        scores.append(matcher.ratio())
+    scores.extend(0.0 for _ in range(len(expected) - len(actual)))
+    return sum(scores) / len(scores) if scores else 0.0
+
+
+def run_worker(backend_name: str, path: str):
+    """Child process: extract every page of one PDF and print timings as JSON."""
+    from modules.pdf_backends import BACKENDS
+
+    backend = BACKENDS[backend_name]
+    started = time.perf_counter()
+    doc = backend.open(path)
+    pages = [backend.page_text(doc, i) for i in range(backend.page_count(doc))]
+    elapsed = time.perf_counter() - started
+    peak_mb = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024 if resource else None
+    print(json.dumps({"seconds": elapsed, "pages": pages, "peak_mb": peak_mb}))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--pages", type=int, nargs="*", default=[20, 200], help="Fixture sizes to generate")
+    parser.add_argument("--lines", type=int, default=40, help="Text lines per fixture page")
+    parser.add_argument("--pdf", nargs="*", default=[], help="Extra PDF files to include")
+    parser.add_argument("--backends", nargs="*", help="Limit to these backends")
+    parser.add_argument("--worker", nargs=2, metavar=("BACKEND", "PATH"), help=argparse.SUPPRESS)
+    args = parser.parse_args()
+    if args.worker:
+        run_worker(*args.worker)
+        return
+
+    from benchmarks.pdf_fixtures import make_pdf
+    from modules.pdf_backends import BACKENDS, available_backends
+
+    backends = [b for b in available_backends() if not args.backends or b in args.backends]
+    missing = [f"{name} (pip install {b.package})" for name, b in BACKENDS.items() if name not in available_backends()]
+    if missing:
+        print("not installed: " + ", ".join(missing))
+
+    corpus = []
+    with tempfile.TemporaryDirectory() as tmp:
+        for pages in args.pages:
+            data, expected = make_pdf(pages, args.lines)
+            path = os.path.join(tmp, f"fixture-{pages}.pdf")
+            with open(path, "wb") as f:
+                f.write(data)
+            corpus.append((f"fixture-{pages}", path, expected))
+        corpus.extend((os.path.basename(p), p, None) for p in args.pdf)
+
+        print(f"{'document':<22}{'backend':<10}{'pages':>7}{'pages/s':>10}{'peak MB':>9}{'fidelity':>10}")
+        for label, path, expected in corpus:
+            for name in backends:
+                proc = subprocess.run([sys.executable, "-m", "benchmarks.bench_pdf_backends", "--worker", name, path],
+                                      capture_output=True, text=True)
+                if proc.returncode != 0:
+                    print(f"{label:<22}{name:<10}  failed: {proc.stderr.strip().splitlines()[-1:]}")
+                    continue
+                result = json.loads(proc.stdout.strip().splitlines()[-1])
+                pages = len(result["pages"])
+                rate = pages / result["seconds"] if result["seconds"] else float("inf")
+                peak = f"{result['peak_mb']:.0f}" if result["peak_mb"] is not None else "-"
+                fidelity = f"{_fidelity(expected, result['pages']):.3f}" if expected else "-"
+                print(f"{label:<22}{name:<10}{pages:>7}{rate:>10.1f}{peak:>9}{fidelity:>10}")
+
+
+if __name__ == "__main__":
+    main()
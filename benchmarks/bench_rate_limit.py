@@ -0,0 +1,71 @@
+"""
+bench_rate_limit.py — Drive the rate limiter against a stub that answers 429s.
+The fake backend rejects the first --fail-next requests with retry-after;
+every call should still succeed after jittered backoff. A final 429 whose
+quota resets beyond the limiter's max delay should fail fast instead.
+
+    python -m benchmarks.bench_rate_limit --calls 20 --fail-next 10
+"""
+
+import argparse
+import io
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from benchmarks.fake_groq import start_server
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--calls", type=int, default=20)
+    parser.add_argument("--threads", type=int, default=8)
+    parser.add_argument("--fail-next", type=int, default=10)
+    parser.add_argument("--retry-after", type=float, default=0.2)
+    parser.add_argument("--rpm", type=int, default=600, help="Client-side requests-per-minute budget")
+    args = parser.parse_args()
+
+    server = start_server(fail_next=args.fail_next, retry_after=args.retry_after)
+    os.environ["GROQ_API_KEY"] = "fake-key"
+    os.environ["GROQ_BASE_URL"] = server.base_url
+    os.environ["LLM_CACHE_DISABLED"] = "1"
+    os.environ["GROQ_RPM"] = os.environ["GROQ_WHISPER_RPM"] = str(args.rpm)
+
+    from modules.llm_engine import generate, transcribe_audio, rate_limit_stats
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=args.threads) as pool:
+        # Distinct prompts so single-flight doesn't merge them
+        futures = [pool.submit(generate, f"question {i}") for i in range(args.calls)]
+        results = []
+        for f in futures:
+            try:
+                results.append(f.result())
+            except Exception as e:
+                results.append(e)
+    elapsed = time.perf_counter() - started
+
+    failures = [r for r in results if isinstance(r, Exception)]
+    print(f"chat: {len(results) - len(failures)}/{len(results)} succeeded in {elapsed:.2f}s")
+    for e in failures[:3]:
+        print(f"  error: {e!r}")
+
+    server.fail_next = 2
+    text = transcribe_audio(io.BytesIO(b"RIFF fake wav"))
+    print(f"whisper: {text!r}")
+
+    from modules.rate_limiter import DailyLimitExceeded
+    server.fail_next, server.retry_after = 1, 3600
+    started = time.perf_counter()
+    try:
+        generate("daily quota check")
+        print("daily quota: call succeeded (expected DailyLimitExceeded)")
+    except DailyLimitExceeded as e:
+        print(f"daily quota: failed fast in {time.perf_counter() - started:.2f}s: {e}")
+    print(f"server: {server.stats}")
+    print(f"limiter: {rate_limit_stats()}")
+    server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,261 @@
+"""
+fake_groq.py — Deterministic local stand-in for the Groq HTTP API.
+Speaks enough of the OpenAI-compatible protocol (chat completions as JSON
+or SSE streams, Whisper transcriptions) for the Groq SDK to talk to it.
+Replies are derived from the prompt, so quiz and flashcard requests get
+valid JSON arrays, and latency, token rate and errors are configurable.
+
+Run standalone:  python -m benchmarks.fake_groq --port 8765 --latency 0.3 --token-rate 250
+Then run the app with GROQ_BASE_URL=http://127.0.0.1:8765 (no API key needed).
+"""
+
+import argparse
+import hashlib
+import json
+import random
+import re
+import threading
+import time
+import uuid
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+_WORDS = ("energy system process example concept model structure theory force particle cell "
+          "function value change reaction pattern result cause effect data signal").split()
+
+
+def _rng_for(text: str) -> random.Random:
+    return random.Random(hashlib.sha256(text.encode("utf-8")).hexdigest())
+
+
+def _sentence(rng: random.Random, words: int = 12) -> str:
+    body = " ".join(rng.choice(_WORDS) for _ in range(words))
+    return body[0].upper() + body[1:] + "."
+
+
+def synthesize_reply(messages: list[dict], words: int = 200, json_object: bool = False) -> str:
+    """
+    Build a deterministic reply shaped like what the app's prompt asks for.
+    json_object (JSON mode) wraps quiz/flashcard arrays in the object key the prompt names.
+    """
+    system = messages[0].get("content", "") if messages and messages[0].get("role") == "system" else ""
+    prompt = messages[-1].get("content", "") if messages else ""
+    rng = _rng_for(system + prompt)
+    wanted = re.search(r"exactly (\d+)", prompt)
+    count = int(wanted.group(1)) if wanted else 5
+    wrapper = re.search(r'single key "(\w+)"', prompt) if json_object else None
+
+    def _array(items: list) -> str:
+        return json.dumps({wrapper.group(1): items} if wrapper else items, indent=1)
+
+    if "quiz" in system.lower():
+        kind = re.search(r'"type" \(always "(\w+)"\)', prompt)
+        kind = kind.group(1) if kind else "mcq"
+        items = []
+        for i in range(count):
+            item = {"type": kind, "question": f"Question {i + 1}: {_sentence(rng, 8)[:-1]}?",
+                    "explanation": _sentence(rng, 10)}
+            if kind == "mcq":
+                item["options"] = [f"{letter}) {_sentence(rng, 3)[:-1]}" for letter in "ABCD"]
+                item["answer"] = rng.choice("ABCD")
+            elif kind == "tf":
+                item["answer"] = rng.choice(["True", "False"])
+            else:
+                item["answer"] = " ".join(rng.choice(_WORDS) for _ in range(2))
+            items.append(item)
+        return _array(items)
+
+    if "flashcard" in system.lower():
+        return _array([{"front": f"{_sentence(rng, 5)[:-1]}?", "back": _sentence(rng, 12)}
+                       for _ in range(count)])
+
+    sections = ["## 📖 Overview", "## 🔍 Details", "## 🌍 Example", "## ✅ Summary"]
+    per_section = max(1, words // (len(sections) * 12))
+    return "\n\n".join(
+        heading + "\n" + " ".join(_sentence(rng) for _ in range(per_section)) for heading in sections
+    )
+
+
+class FakeGroqHandler(BaseHTTPRequestHandler):
+    # HTTP/1.1 so clients can keep connections alive between requests
+    protocol_version = "HTTP/1.1"
+
+    def log_message(self, format, *args):
+        pass
+
+    def _read_json(self) -> dict:
+        length = int(self.headers.get("Content-Length", 0))
+        body = self.rfile.read(length) if length else b""
+        try:
+            return json.loads(body or b"{}")
+        except json.JSONDecodeError:
+            return {}
+
+    def _send_json(self, status: int, payload: dict, headers: dict | None = None):
+        body = json.dumps(payload).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _rate_limit_headers(self) -> dict:
+        server = self.server
+        return {
+            "x-ratelimit-limit-requests": str(server.rpm),
+            "x-ratelimit-remaining-requests": str(max(0, server.rpm - server.stats["requests"])),
+            "x-ratelimit-reset-requests": "2m59.56s",
+        }
+
+    def _maybe_reject(self) -> bool:
+        """Answer with a 429 while the server's fail_next counter is positive."""
+        server = self.server
+        with server.lock:
+            if server.fail_next <= 0:
+                return False
+            server.fail_next -= 1
+            server.stats["rejected"] += 1
+        # Drain the body so the kept-alive connection stays in sync
+        self.rfile.read(int(self.headers.get("Content-Length", 0)))
+        self._send_json(429, {"error": {"message": "Rate limit reached", "type": "requests", "code": "rate_limit_exceeded"}},
+                        headers={"retry-after": str(server.retry_after), "x-ratelimit-remaining-requests": "0",
+                                 "x-ratelimit-reset-requests": f"{server.retry_after}s"})
+        return True
+
+    def _maybe_fail(self) -> bool:
+        """Randomly answer with a 503 at the configured error rate (seeded, so runs repeat)."""
+        server = self.server
+        with server.lock:
+            fail = server.error_rate > 0 and server.rng.random() < server.error_rate
+            if fail:
+                server.stats["errors"] += 1
+        if fail:
+            self.rfile.read(int(self.headers.get("Content-Length", 0)))
+            self._send_json(503, {"error": {"message": "Injected failure", "type": "server_error"}})
+        return fail
+
+    def do_POST(self):
+        with self.server.lock:
+            self.server.stats["requests"] += 1
+        if self._maybe_reject() or self._maybe_fail():
+            return
+        if self.path.endswith("/chat/completions"):
+            self._chat_completions(self._read_json())
+        elif self.path.endswith("/audio/transcriptions"):
+            self._transcription()
+        else:
+            self._send_json(404, {"error": {"message": f"Unknown path {self.path}"}})
+
+    def _transcription(self):
+        self.rfile.read(int(self.headers.get("Content-Length", 0)))
+        time.sleep(self.server.latency)
+        body = self.server.transcript.encode("utf-8")
+        self.send_response(200)
+        self.send_header("Content-Type", "text/plain; charset=utf-8")
+        self.send_header("Content-Length", str(len(body)))
+        for name, value in self._rate_limit_headers().items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _chat_completions(self, request: dict):
+        server = self.server
+        time.sleep(server.latency)
+        json_object = (request.get("response_format") or {}).get("type") == "json_object"
+        reply = server.reply or synthesize_reply(request.get("messages", []), server.reply_words, json_object)
+        model = request.get("model", "fake-model")
+        # Pace output like a real model: roughly one word per token
+        token_delay = 1.0 / server.token_rate if server.token_rate else 0.0
+        if not request.get("stream"):
+            time.sleep(token_delay * len(reply.split()))
+            self._send_json(200, {
+                "id": f"chatcmpl-{uuid.uuid4().hex}",
+                "object": "chat.completion",
+                "created": int(time.time()),
+                "model": model,
+                "choices": [{"index": 0, "finish_reason": "stop",
+                             "message": {"role": "assistant", "content": reply}}],
+                "usage": {"prompt_tokens": 10, "completion_tokens": len(reply.split()), "total_tokens": 10 + len(reply.split())},
+            }, headers=self._rate_limit_headers())
+            return
+
+        self.send_response(200)
+        self.send_header("Content-Type", "text/event-stream")
+        self.send_header("Transfer-Encoding", "chunked")
+        for name, value in self._rate_limit_headers().items():
+            self.send_header(name, value)
+        self.end_headers()
+        try:
+            self._stream_reply(reply, model, token_delay)
+        except (BrokenPipeError, ConnectionResetError):
+            # Client cancelled mid-stream (e.g. the Stop button)
+            self.close_connection = True
+
+    def _stream_reply(self, reply: str, model: str, token_delay: float):
+        chunk_id = f"chatcmpl-{uuid.uuid4().hex}"
+        words = reply.split(" ")
+        for i, word in enumerate(words):
+            if token_delay:
+                time.sleep(token_delay)
+            delta = word if i == 0 else " " + word
+            self._send_event({"id": chunk_id, "object": "chat.completion.chunk", "created": int(time.time()),
+                              "model": model, "choices": [{"index": 0, "delta": {"content": delta}, "finish_reason": None}]})
+        self._send_event({"id": chunk_id, "object": "chat.completion.chunk", "created": int(time.time()),
+                          "model": model, "choices": [{"index": 0, "delta": {}, "finish_reason": "stop"}],
+                          "x_groq": {"id": chunk_id, "usage": {"prompt_tokens": 10, "completion_tokens": len(words),
+                                                               "total_tokens": 10 + len(words)}}})
+        self._send_chunk(b"data: [DONE]\n\n")
+        self._send_chunk(b"")
+
+    def _send_event(self, payload: dict):
+        self._send_chunk(f"data: {json.dumps(payload)}\n\n".encode("utf-8"))
+
+    def _send_chunk(self, data: bytes):
+        self.wfile.write(f"{len(data):X}\r\n".encode("ascii") + data + b"\r\n")
+        self.wfile.flush()
+
+
+def start_server(port: int = 0, latency: float = 0.0, reply: str | None = None, token_rate: float = 0.0,
+                 error_rate: float = 0.0, fail_next: int = 0, retry_after: float = 1.0,
+                 rpm: int = 1_000_000, reply_words: int = 200, seed: int = 0) -> ThreadingHTTPServer:
+    """
+    Start the fake backend on a daemon thread; server.base_url is ready for GROQ_BASE_URL.
+    latency: seconds before the first byte; token_rate: words per second (0 = instant);
+    error_rate: fraction of requests answered with 503; fail_next: answer that many
+    requests with 429 + retry-after. All are attributes and can be changed while running.
+    """
+    server = ThreadingHTTPServer(("127.0.0.1", port), FakeGroqHandler)
+    server.daemon_threads = True
+    server.lock = threading.Lock()
+    server.latency = latency
+    server.reply = reply
+    server.reply_words = reply_words
+    server.token_rate = token_rate
+    server.error_rate = error_rate
+    server.rng = random.Random(seed)
+    server.transcript = "This is a fake transcription."
+    server.fail_next = fail_next
+    server.retry_after = retry_after
+    server.rpm = rpm
+    server.stats = {"requests": 0, "rejected": 0, "errors": 0}
+    server.base_url = f"http://127.0.0.1:{server.server_address[1]}"
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Run the fake Groq backend.")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--latency", type=float, default=0.0, help="Seconds to wait before answering")
+    parser.add_argument("--token-rate", type=float, default=0.0, help="Streamed words per second (0 = instant)")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="Fraction of requests answered with 503")
+    parser.add_argument("--fail-next", type=int, default=0, help="Answer this many requests with 429 first")
+    args = parser.parse_args()
+    srv = start_server(args.port, args.latency, token_rate=args.token_rate,
+                       error_rate=args.error_rate, fail_next=args.fail_next)
+    print(f"Fake Groq backend listening on {srv.base_url}")
+    try:
+        threading.Event().wait()
+    except KeyboardInterrupt:
+        srv.shutdown()
@@ -0,0 +1,82 @@
+"""
+pdf_fixtures.py — Generates text PDFs for the extraction benchmarks.
+Writes minimal but valid PDFs (Helvetica text pages, one content stream
+per page) so the benchmarks don't need checked-in binaries or a PDF
+writing library. The expected text of every page is returned alongside,
+for fidelity checks.
+
+    python -m benchmarks.pdf_fixtures --pages 300 --out .cache/fixture-300.pdf
+"""
+
+import argparse
+import random
+
+_WORDS = ("cell energy membrane enzyme protein reaction gradient molecule structure function "
+          "transport signal receptor pathway equilibrium theory model evidence system").split()
+
+
+def _escape(text: str) -> str:
+    return text.replace("\\", "\\\\").replace("(", "\\(").replace(")", "\\)")
+
+
+def page_lines(page: int, lines: int, seed: int = 0) -> list[str]:
+    rng = random.Random(seed * 100_003 + page)
+    out = [f"Page {page + 1}"]
+    for _ in range(lines - 1):
+        out.append(" ".join(rng.choice(_WORDS) for _ in range(rng.randint(6, 11))) + ".")
+    return out
+
+
+def make_pdf(pages: int = 50, lines_per_page: int = 40, seed: int = 0) -> tuple[bytes, list[str]]:
+    """Return (pdf_bytes, expected_page_texts) for a document of plain text pages."""
+    objects: list[bytes] = []
+    texts: list[str] = []
+
+    def add(body: bytes) -> int:
+        objects.append(body)
+        return len(objects)
+
+    catalog = add(b"")  # filled in once the page tree number is known
+    tree = add(b"")
+    font = add(b"<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica /Encoding /WinAnsiEncoding >>")
+    kids = []
+    for page in range(pages):
+        lines = page_lines(page, lines_per_page, seed)
+        texts.append("\n".join(lines))
+        ops = ["BT", "/F1 10 Tf", "12 TL", "50 800 Td"]
+        for line in lines:
+            ops.append(f"({_escape(line)}) Tj T*")
+        ops.append("ET")
+        stream = "\n".join(ops).encode("latin-1")
+        content = add(b"<< /Length %d >>\nstream\n" % len(stream) + stream + b"\nendstream")
+        kids.append(add(
+            b"<< /Type /Page /Parent %d 0 R /MediaBox [0 0 595 842] "
+            b"/Resources << /Font << /F1 %d 0 R >> >> /Contents %d 0 R >>" % (tree, font, content)
+        ))
+    objects[catalog - 1] = b"<< /Type /Catalog /Pages %d 0 R >>" % tree
+    objects[tree - 1] = (b"<< /Type /Pages /Count %d /Kids [" % pages
+                         + b" ".join(b"%d 0 R" % k for k in kids) + b"] >>")
+
+    out = bytearray(b"%PDF-1.4\n")
+    offsets = []
+    for number, body in enumerate(objects, 1):
+        offsets.append(len(out))
+        out += b"%d 0 obj\n" % number + body + b"\nendobj\n"
+    xref = len(out)
+    out += b"xref\n0 %d\n0000000000 65535 f \n" % (len(objects) + 1)
+    for offset in offsets:
+        out += b"%010d 00000 n \n" % offset
+    out += b"trailer\n<< /Size %d /Root %d 0 R >>\nstartxref\n%d\n%%%%EOF\n" % (len(objects) + 1, catalog, xref)
+    return bytes(out), texts
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Write a generated text PDF.")
+    parser.add_argument("--pages", type=int, default=50)
+    parser.add_argument("--lines", type=int, default=40)
+    parser.add_argument("--out", default="fixture.pdf")
+    args = parser.parse_args()
+    data, _ = make_pdf(args.pages, args.lines)
+    with open(args.out, "wb") as f:
+        f.write(data)
+    print(f"Wrote {args.pages} pages ({len(data):,} bytes) to {args.out}")
@@ -15,10 +15,21 @@ from modules.database import (
     upsert_user_profile,
     save_note, get_notes, delete_note,
     save_quiz_result, get_quiz_history,
-    save_flashcard_set, get_flashcard_sets,
+    save_flashcard_set, get_flashcard_sets, get_flashcard_cards,
+    init_card_reviews, get_due_reviews, save_card_reviews,
     save_chat_history, get_chat_history,
 )
 import time
+import hashlib
+from collections import OrderedDict
+
+# Per-session memo of extracted PDF text (bounded by total characters kept)
+PDF_MEMO_MAX_CHARS = int(os.getenv("PDF_MEMO_MAX_CHARS", 4_000_000))
+PDF_MEMO_MAX_ENTRIES = int(os.getenv("PDF_MEMO_MAX_ENTRIES", 4))
+# Due flashcards loaded per review session
+REVIEW_BATCH_SIZE = int(os.getenv("REVIEW_BATCH_SIZE", 100))
+# Saved flashcard sets listed per page
+FLASH_SETS_PAGE_SIZE = 20
 
 
 def clean_text_for_speech(text):
@@ -40,6 +51,101 @@ def clean_text_for_speech(text):
     text = text.replace('`', '')
     return text.strip()
 
+
+def render_stream(chunks, placeholder, on_update=None, repaint_interval=0.05) -> str:
+    """
+    Paint streamed LLM tokens into an st.empty() placeholder as they arrive.
+    on_update receives the accumulated text so partial output survives a
+    mid-stream rerun (e.g. the Stop button). Returns the full text.
+    """
+    parts = []
+    last_paint = 0.0
+    try:
+        for chunk in chunks:
+            parts.append(chunk)
+            text = "".join(parts)
+            if on_update:
+                on_update(text)
+            # Throttle repaints so long answers don't flood the websocket
+            now = time.monotonic()
+            if now - last_paint >= repaint_interval:
+                placeholder.markdown(text + "▌")
+                last_paint = now
+    finally:
+        # Closing the generator closes the upstream HTTP stream when interrupted
+        if hasattr(chunks, "close"):
+            chunks.close()
+    text = "".join(parts).strip()
+    if on_update:
+        on_update(text)
+    placeholder.markdown(text)
+    return text
+
+
+def render_item_stream(items, placeholder, describe, on_update=None, total=None) -> list:
+    """
+    Show streamed quiz questions / flashcards in an st.empty() placeholder as
+    each one completes. describe(item) gives its preview line; on_update gets
+    the list so far so items survive a mid-stream rerun. Returns all items.
+    """
+    received = []
+    try:
+        for item in items:
+            received.append(item)
+            if on_update:
+                on_update(list(received))
+            progress = f"{len(received)} of {total}" if total else f"{len(received)}"
+            lines = [f"{i}. {describe(it)}" for i, it in enumerate(received, 1)]
+            placeholder.markdown(f"**Ready: {progress}**\n\n" + "\n".join(lines) + "\n\n▌")
+    finally:
+        if hasattr(items, "close"):
+            items.close()
+    return received
+
+
+def memoized_pdf_read(uploaded, page_spec: str, read):
+    """
+    Return the extraction result of an upload, running read only the first time.
+    Keyed by the file's content hash and page range, so widget reruns reuse
+    the result; least recently used entries are evicted beyond the size caps.
+    """
+    digests = st.session_state.setdefault("pdf_digests", {})
+    file_key = (uploaded.file_id, uploaded.size)
+    digest = digests.get(file_key)
+    if digest is None:
+        digest = hashlib.sha256(uploaded.getvalue()).hexdigest()
+        digests.clear()  # Only the current upload needs a remembered digest
+        digests[file_key] = digest
+
+    memo = st.session_state.setdefault("pdf_text_memo", OrderedDict())
+    key = (digest, page_spec.strip())
+    if key in memo:
+        memo.move_to_end(key)
+        return memo[key]
+
+    result = read(uploaded, page_spec)
+    # Partial, failed and timed-out results are kept too, so reruns don't send the
+    # same upload back to the sandbox and hit the limit again (queueing behind
+    # other uploads doesn't count toward the time limit, so a timeout is the file's own)
+    memo[key] = result
+    while len(memo) > 1 and (len(memo) > PDF_MEMO_MAX_ENTRIES
+                             or sum(len(r["text"]) for r in memo.values()) > PDF_MEMO_MAX_CHARS):
+        memo.popitem(last=False)
+    return result
+
+
+def show_budget_note(report: dict):
+    """Tell the user when their input was condensed or trimmed to fit the model's context."""
+    if report.get("compressed"):
+        st.caption(f"🗜️ Your text is longer than the model can read at once: condensed locally to the "
+                   f"{report['kept_sentences']:,} most important of {report['total_sentences']:,} sentences "
+                   f"({report['kept_tokens']:,} of {report['total_tokens']:,} tokens).")
+    elif report.get("truncated"):
+        kept_pct = int(report["kept_tokens"] / report["total_tokens"] * 100) if report["total_tokens"] else 100
+        st.caption(f"✂️ Your text is longer than the model can read at once: using the first "
+                   f"{report['kept_tokens']:,} of {report['total_tokens']:,} tokens ({kept_pct}%), "
+                   f"{report['dropped_chars']:,} characters left out.")
+
 # ─── Page Config ────────────────────────────────────────────────────────────
 st.set_page_config(
     page_title="StudyBuddy AI",
@@ -458,15 +564,34 @@ button { cursor: pointer !important; }
 """, unsafe_allow_html=True)
 
 # ─── Imports after CSS ───────────────────────────────────────────────────────
-from modules.explainer import explain_topic, LEVELS
-from modules.summarizer import summarize_notes, extract_text_from_pdf
-from modules.quiz_generator import generate_quiz
-from modules.flashcard_generator import generate_flashcards
-from modules.chat_tutor import get_tutor_response
-from modules.llm_engine import transcribe_audio
-from modules.chat_tutor import get_tutor_response
+from modules.explainer import (
+    explain_topic_stream, LEVELS,
+    start_prefetch, cancel_prefetch, prefetched,
+)
+from modules.summarizer import summarize_notes_stream, read_pdf, fit_notes
+from modules.quiz_generator import generate_quiz_stream, fit_content as fit_quiz_content
+from modules.question_bank import question_bank, pool_key as quiz_pool_key
+from modules.grader import grade_answers
+from modules.flashcard_generator import (
+    generate_flashcards_stream, generate_flashcards_chunked,
+    fit_content as fit_flash_content, needs_chunking as needs_flash_chunking,
+)
+from modules.spaced_repetition import ReviewQueue, GRADES as REVIEW_GRADES, format_timestamp
+from modules.chat_tutor import get_tutor_response_stream
 from modules.llm_engine import transcribe_audio
 from modules.voice_engine import text_to_speech, speak, stop_audio
+from modules.llm_engine import cache_stats, rate_limit_stats, inflight_stats
+from modules import metrics
+
+
+@st.cache_resource
+def _start_metrics_endpoint(port: int):
+    """Serve Prometheus /metrics once per process when METRICS_PORT is set."""
+    return metrics.start_metrics_server(port, host=os.getenv("METRICS_HOST", "127.0.0.1"))
+
+
+if os.getenv("METRICS_PORT"):
+    _start_metrics_endpoint(int(os.getenv("METRICS_PORT")))
 
 # ─── Sidebar ────────────────────────────────────────────────────────────────
 with st.sidebar:
@@ -554,6 +679,34 @@ with st.sidebar:
         help="Use 'Browser' if you cannot hear audio from the server."
     )
 
+    # 📈 Admin-only LLM metrics panel
+    if os.getenv("STUDYBUDDY_ADMIN", "").lower() in ("1", "true", "yes"):
+        st.markdown("---")
+        with st.expander("📈 LLM Metrics"):
+            summary = metrics.summary()
+            if summary:
+                rows = []
+                for feature, m in summary.items():
+                    rows.append({
+                        "feature": feature,
+                        "calls": m["calls"],
+                        "errors": m["errors"],
+                        "cache hit %": round(m["cache_hit_rate"] * 100, 1),
+                        "p50 s": m["latency"].get("p50"),
+                        "p95 s": m["latency"].get("p95"),
+                        "p99 s": m["latency"].get("p99"),
+                        "TTFT p50 s": m["ttft"].get("p50"),
+                        "tokens in/out": f"{m['prompt_tokens']}/{m['completion_tokens']}",
+                    })
+                st.dataframe(rows, hide_index=True, use_container_width=True)
+            else:
+                st.caption("No LLM calls recorded yet.")
+            st.caption(f"Cache: {cache_stats()}")
+            st.caption(f"Single-flight: {inflight_stats()}")
+            st.caption(f"Rate limits: {rate_limit_stats()}")
+            st.download_button("📥 Prometheus metrics", metrics.prometheus_text(),
+                               file_name="studybuddy_metrics.txt", mime="text/plain")
+
     st.markdown("---")
     st.markdown("""
     <div style='font-size:0.72rem; color:#475569; text-align:center;'>
@@ -766,15 +919,48 @@ elif selected_page == "Explain":
                                      on_change=update_explain_topic)
     with col2:
         level_choice = st.selectbox("🎯 Complexity Level", list(LEVELS.keys()), key="explain_level")
+    prefetch_on = st.checkbox("⚡ Prepare the other levels in the background", key="explain_prefetch_on",
+                              help="After an explanation finishes, the other two levels are generated quietly so switching is instant.")
+    if not prefetch_on and st.session_state.get("explain_prefetch"):
+        cancel_prefetch(st.session_state.explain_prefetch)
+        st.session_state.explain_prefetch = None
 
     if st.button("✨ Explain It", key="btn_explain", use_container_width=True):
         if not topic_input.strip():
             st.warning("Please enter a topic first!")
         else:
-            with st.spinner("🧠 Generating explanation..."):
-                result = explain_topic(topic_input.strip(), level_choice)
+            st.session_state.explain_topic = topic_input # Ensure saved
+            st.session_state.explain_result = ""
+            handle = st.session_state.get("explain_prefetch")
+            pending = prefetched(handle, topic_input.strip(), level_choice)
+            result = None
+            if pending is not None and (pending.running() or pending.done()):
+                # This level was already being prepared in the background
+                with st.spinner("⚡ Finishing the prepared explanation..."):
+                    result = pending.result()
+            elif pending is not None:
+                # Still queued behind other background work: don't make the click wait for it
+                pending.cancel()
+            if result:
                 st.session_state.explain_result = result
-                st.session_state.explain_topic = topic_input # Ensure saved
+            else:
+                if handle and handle["topic"] != topic_input.strip():
+                    cancel_prefetch(handle)
+                    st.session_state.explain_prefetch = None
+                st.button("⏹ Stop", key="btn_stop_explain")
+                stream_box = st.empty()
+                stream_box.markdown("🧠 Generating explanation...")
+
+                def _save_explain(text):
+                    st.session_state.explain_result = text
+
+                render_stream(explain_topic_stream(topic_input.strip(), level_choice), stream_box, _save_explain)
+                # The persistent result box below renders the final text
+                stream_box.empty()
+
+                if prefetch_on and st.session_state.explain_result:
+                    cancel_prefetch(st.session_state.get("explain_prefetch"))
+                    st.session_state.explain_prefetch = start_prefetch(topic_input.strip(), level_choice)
     
     # Display Result (Persistent)
     if st.session_state.explain_result:
@@ -850,15 +1036,22 @@ elif selected_page == "Summarize":
                                    on_change=update_summarize_text)
     else:
         uploaded = st.file_uploader("Upload a PDF file", type=["pdf"], key="summ_pdf")
+        page_spec = st.text_input("Pages (optional)", key="summ_pdf_pages",
+                                  placeholder="e.g. 1-20, 35 (leave empty for the whole document)")
         if uploaded:
             with st.spinner("📖 Extracting text from PDF..."):
-                try:
-                    notes_text = extract_text_from_pdf(uploaded)
-                    st.success(f"✅ Extracted {len(notes_text):,} characters from PDF")
-                    with st.expander("Preview extracted text"):
-                        st.text(notes_text[:1000] + ("..." if len(notes_text) > 1000 else ""))
-                except Exception as e:
-                    st.error(f"Error reading PDF: {e}")
+                pdf = memoized_pdf_read(uploaded, page_spec, read_pdf)
+            if pdf["status"] == "error" or not pdf["pages"]:
+                st.error(f"Error reading PDF: {pdf['message'] or 'no readable pages'}")
+            else:
+                notes_text = pdf["text"]
+                if pdf["status"] != "ok":
+                    st.warning(f"⚠️ {pdf['message']} Using the {len(pdf['pages'])} pages read before that.")
+                elif pdf["message"]:
+                    st.caption(f"ℹ️ {pdf['message']}")
+                st.success(f"✅ Extracted {len(notes_text):,} characters from PDF")
+                with st.expander("Preview extracted text"):
+                    st.text(notes_text[:1000] + ("..." if len(notes_text) > 1000 else ""))
 
     if st.button("📝 Summarize Notes", key="btn_summarize", use_container_width=True):
         if not notes_text.strip():
@@ -866,11 +1059,38 @@ elif selected_page == "Summarize":
         elif len(notes_text.strip()) < 50:
             st.warning("Text is too short to summarize. Please provide more content.")
         else:
-            with st.spinner("✍️ Summarizing your notes..."):
-                result = summarize_notes(notes_text.strip())
-                st.session_state.summarize_result = result
-                # If generated from PDF, text area might be empty if we switch modes? 
-                # But result persists.
+            st.session_state.summarize_result = ""
+            st.button("⏹ Stop", key="btn_stop_summarize")
+            progress_bar = None
+            # Fitting counts tokens over the whole document, so do it once and pass it on
+            fitted = fit_notes(notes_text.strip())
+            if fitted[1]["truncated"]:
+                st.caption("📚 Long document: condensing it section by section before the final summary.")
+                progress_bar = st.progress(0.0)
+            else:
+                show_budget_note(fitted[1])
+            stream_box = st.empty()
+            stream_box.markdown("✍️ Summarizing your notes...")
+
+            def _save_summary(text):
+                st.session_state.summarize_result = text
+
+            def _show_progress(stage, done, total):
+                if stage == "skipped":
+                    st.warning(f"⚠️ {done} of {total} parts of the document couldn't be summarized, "
+                               "so the summary leaves them out.")
+                    return
+                label = "Reading sections" if stage == "map" else "Merging notes"
+                progress_bar.progress(done / total, text=f"{label}: {done} of {total}")
+
+            render_stream(summarize_notes_stream(notes_text.strip(), on_progress=_show_progress if progress_bar else None,
+                                                 fitted=fitted),
+                          stream_box, _save_summary)
+            stream_box.empty()
+            if progress_bar is not None:
+                progress_bar.empty()
+            # If generated from PDF, text area might be empty if we switch modes? 
+            # But result persists.
     
     # Display Result (Persistent)
     if st.session_state.summarize_result:
@@ -950,19 +1170,45 @@ elif selected_page == "Quiz Me":
     with col3:
         quiz_type = st.selectbox("Type", ["MCQ", "True/False", "Short Answer"], key="quiz_type")
 
-    if st.button("🎯 Generate Quiz", key="btn_generate_quiz", use_container_width=True):
+    # "Try Again" asks for a fresh set of questions on the next run
+    if st.button("🎯 Generate Quiz", key="btn_generate_quiz", use_container_width=True) \
+            or st.session_state.pop("quiz_retry", False):
         if not quiz_topic.strip():
             st.warning("Please enter a topic or notes!")
         else:
-            with st.spinner("🎲 Crafting your quiz..."):
-                questions = generate_quiz(quiz_topic.strip(), quiz_num, quiz_type)
+            show_budget_note(fit_quiz_content(quiz_topic.strip(), quiz_num, quiz_type)[1])
+            st.session_state.quiz_questions = []
+            st.session_state.quiz_answers = {}
+            st.session_state.quiz_submitted = False
+            for widget_key in [k for k in st.session_state if str(k).startswith("quiz_ans_")]:
+                del st.session_state[widget_key]
+            # Question ids already shown this session, per topic pool, so repeats are avoided
+            seen = st.session_state.setdefault("quiz_seen", {}).setdefault(
+                quiz_pool_key(quiz_topic.strip(), quiz_type), set())
+
+            questions = question_bank.take(quiz_topic.strip(), quiz_type, quiz_num, seen)
             if questions:
                 st.session_state.quiz_questions = questions
-                st.session_state.quiz_answers = {}
-                st.session_state.quiz_submitted = False
-                st.success(f"✅ Generated {len(questions)} questions!")
+                st.success(f"⚡ {len(questions)} new questions ready!")
             else:
-                st.error("Failed to generate quiz. Please try again with a different topic.")
+                st.button("⏹ Stop", key="btn_stop_quiz")
+                stream_box = st.empty()
+                stream_box.markdown("🎲 Crafting your quiz...")
+
+                def _save_questions(items):
+                    st.session_state.quiz_questions = items
+
+                questions = render_item_stream(generate_quiz_stream(quiz_topic.strip(), quiz_num, quiz_type), stream_box,
+                                               lambda q: q.get("question", ""), _save_questions, total=quiz_num)
+                # The quiz below renders the questions with their answer widgets
+                stream_box.empty()
+                if questions:
+                    question_bank.add(quiz_topic.strip(), quiz_type, questions, seen)
+                    st.success(f"✅ Generated {len(questions)} questions!")
+                else:
+                    st.error("Failed to generate quiz. Please try again with a different topic.")
+            # Top the pool up in the background so the next quiz is instant
+            question_bank.refill(quiz_topic.strip(), quiz_type, seen, wanted=quiz_num)
 
     # Display quiz
     if st.session_state.quiz_questions and not st.session_state.quiz_submitted:
@@ -1000,6 +1246,7 @@ elif selected_page == "Quiz Me":
 
         if st.button("📊 Submit & See Results", key="btn_submit_quiz", use_container_width=True):
             st.session_state.quiz_submitted = True
+            st.session_state.pop("quiz_grades", None)
             st.rerun()
 
     # Show results
@@ -1015,6 +1262,19 @@ elif selected_page == "Quiz Me":
             match = re.search(r"[A-D]", str(value).upper())
             return match.group(0) if match else None
 
+        def _is_short_answer(q):
+            qtype = str(q.get("type", "")).lower().strip()
+            return qtype not in ["mcq", "multiple choice", "multiple-choice", "tf", "true/false", "true-false"]
+
+        # Grade every short answer in one pass (ambiguous ones share a single LLM call), once per submission
+        if "quiz_grades" not in st.session_state:
+            short = [i for i, q in enumerate(questions) if _is_short_answer(q)]
+            grades = grade_answers([{"question": questions[i].get("question", ""),
+                                     "answer": str(answers.get(i, "")).strip(),
+                                     "expected": str(questions[i].get("answer", "")).strip()} for i in short])
+            st.session_state.quiz_grades = dict(zip(short, grades))
+        short_grades = st.session_state.quiz_grades
+
         for i, q in enumerate(questions):
             qtype = str(q.get("type", "")).lower().strip()
             correct = str(q.get("answer", "")).strip()
@@ -1032,7 +1292,7 @@ elif selected_page == "Quiz Me":
             elif qtype in ["tf", "true/false", "true-false"]:
                 is_correct = user_ans.lower() == correct.lower()
             else:
-                is_correct = user_ans.lower().strip() == correct.lower().strip()
+                is_correct = short_grades[i]["correct"]
 
             if is_correct:
                 score += 1
@@ -1071,6 +1331,7 @@ elif selected_page == "Quiz Me":
             st.session_state.quiz_submitted = False
             st.session_state.quiz_answers = {}
             st.session_state["quiz_result_saved"] = False
+            st.session_state["quiz_retry"] = True
             st.rerun()
 
     # --- Quiz History ---
@@ -1118,12 +1379,34 @@ elif selected_page == "Flashcards":
         if not flash_topic.strip():
             st.warning("Please enter a topic!")
         else:
-            with st.spinner("🎴 Creating flashcards..."):
-                cards = generate_flashcards(flash_topic.strip(), flash_num)
-            if cards:
+            st.session_state.flashcards = []
+            st.session_state.card_index = 0
+            st.session_state.card_flipped = False
+            if needs_flash_chunking(flash_topic.strip()):
+                # Long notes: card every section in parallel so the deck covers the whole document
+                st.caption("📚 Long notes: creating cards section by section across the whole document.")
+                progress_bar = st.progress(0.0)
+
+                def _show_progress(done, total):
+                    progress_bar.progress(done / total, text=f"Reading sections: {done} of {total}")
+
+                with st.spinner("🎴 Creating flashcards..."):
+                    cards = generate_flashcards_chunked(flash_topic.strip(), flash_num, on_progress=_show_progress)
+                progress_bar.empty()
                 st.session_state.flashcards = cards
-                st.session_state.card_index = 0
-                st.session_state.card_flipped = False
+            else:
+                show_budget_note(fit_flash_content(flash_topic.strip(), flash_num)[1])
+                st.button("⏹ Stop", key="btn_stop_flash")
+                stream_box = st.empty()
+                stream_box.markdown("🎴 Creating flashcards...")
+
+                def _save_cards(items):
+                    st.session_state.flashcards = items
+
+                cards = render_item_stream(generate_flashcards_stream(flash_topic.strip(), flash_num), stream_box,
+                                           lambda c: c.get("front", ""), _save_cards, total=flash_num)
+                stream_box.empty()
+            if cards:
                 st.success(f"✅ Created {len(cards)} flashcards!")
             else:
                 st.error("Failed to generate flashcards. Please try again.")
@@ -1195,21 +1478,97 @@ elif selected_page == "Flashcards":
                 </div>
                 """, unsafe_allow_html=True)
 
+    # --- Spaced-repetition review of saved sets ---
+    if _UID:
+        st.markdown("---")
+        st.markdown("#### 🔁 Review Due Cards")
+        if "review_queue" not in st.session_state:
+            st.caption("Cards from your saved sets come back just before you would forget them.")
+            if st.button("▶ Start Review", key="btn_start_review", use_container_width=True):
+                # Only cards due now are loaded, soonest first
+                due_rows = get_due_reviews(_UID, format_timestamp(time.time()), limit=REVIEW_BATCH_SIZE)
+                queue = ReviewQueue.from_rows(due_rows)
+                st.session_state.review_queue = queue
+                st.session_state.review_cards = get_flashcard_cards(_UID, {set_id for set_id, _ in queue.keys})
+                st.session_state.review_flipped = False
+                st.rerun()
+        else:
+            queue = st.session_state.review_queue
+            row = queue.next_due()
+            review_card = None
+            while row is not None:
+                set_id, card_index = queue.keys[row]
+                set_cards = st.session_state.review_cards.get(set_id, [])
+                if card_index < len(set_cards):
+                    review_card = set_cards[card_index]
+                    break
+                queue.skip(row)  # The set was deleted or changed since it was scheduled
+                row = queue.next_due()
+
+            if review_card is None:
+                upcoming = queue.next_due_time()
+                if upcoming is not None:
+                    st.success(f"🎉 All caught up! Next card comes back in {max(1, int((upcoming - time.time()) // 60))} min.")
+                else:
+                    st.success("🎉 All caught up! No cards are due right now.")
+            else:
+                front_text = html.escape(str(review_card.get("front", "")).strip()) or "No question provided."
+                back_text = html.escape(str(review_card.get("back", "")).strip()) or "No answer provided."
+                face = back_text if st.session_state.review_flipped else front_text
+                label = "Answer" if st.session_state.review_flipped else "Question"
+                st.markdown(f"""
+                <div class='quiz-question'>
+                    <div class='q-num'>{label} · {queue.due_count()} due</div>
+                    <div class='q-text'>{face}</div>
+                </div>
+                """, unsafe_allow_html=True)
+                if not st.session_state.review_flipped:
+                    if st.button("👁️ Show Answer", key="btn_review_flip", use_container_width=True):
+                        st.session_state.review_flipped = True
+                        st.rerun()
+                else:
+                    for col, grade in zip(st.columns(len(REVIEW_GRADES)), REVIEW_GRADES):
+                        with col:
+                            if st.button(grade, key=f"btn_review_{grade}", use_container_width=True):
+                                save_card_reviews(_UID, [queue.review(row, REVIEW_GRADES[grade])])
+                                st.session_state.review_flipped = False
+                                st.rerun()
+
+            if st.button("⏹ End Review", key="btn_end_review"):
+                for state_key in ("review_queue", "review_cards", "review_flipped"):
+                    st.session_state.pop(state_key, None)
+                st.rerun()
+
     # --- Load Saved Flashcard Sets ---
-    flash_sets = get_flashcard_sets(_UID)
+    # Only set metadata is listed; a set's cards are fetched when it is loaded
+    shown_sets = st.session_state.setdefault("flash_sets_shown", FLASH_SETS_PAGE_SIZE)
+    flash_sets = get_flashcard_sets(_UID, limit=shown_sets + 1)
+    has_more = len(flash_sets) > shown_sets
+    flash_sets = flash_sets[:shown_sets]
     if flash_sets:
         st.markdown("---")
-        with st.expander(f"🗂️ My Saved Flashcard Sets ({len(flash_sets)})"):
+        with st.expander(f"🗂️ My Saved Flashcard Sets ({len(flash_sets)}{'+' if has_more else ''})"):
             for fs in flash_sets:
                 col_load, col_info = st.columns([1, 3])
                 with col_info:
-                    st.markdown(f"**{html.escape(fs.get('topic','Set'))}** · {len(fs.get('cards',[]))} cards · {fs.get('created_at','')[:10]}")
+                    count = fs.get("card_count")
+                    count_text = f"{count} cards · " if count is not None else ""
+                    st.markdown(f"**{html.escape(fs.get('topic','Set'))}** · {count_text}{(fs.get('created_at') or '')[:10]}")
                 with col_load:
                     if st.button("Load", key=f"load_flash_{fs['id']}"):
-                        st.session_state.flashcards = fs["cards"]
-                        st.session_state.card_index = 0
-                        st.session_state.card_flipped = False
-                        st.rerun()
+                        loaded = get_flashcard_cards(_UID, [fs["id"]]).get(fs["id"], [])
+                        if loaded:
+                            # Sets saved before reviews existed join them on first load
+                            init_card_reviews(_UID, fs["id"], len(loaded))
+                            st.session_state.flashcards = loaded
+                            st.session_state.card_index = 0
+                            st.session_state.card_flipped = False
+                            st.rerun()
+                        else:
+                            st.warning("This set has no cards.")
+            if has_more and st.button("Show more", key="btn_more_flash_sets"):
+                st.session_state.flash_sets_shown = shown_sets + FLASH_SETS_PAGE_SIZE
+                st.rerun()
 
 elif selected_page == "Chat Tutor":
     # ══════════════════════════════════════════════════════
@@ -1393,11 +1752,23 @@ elif selected_page == "Chat Tutor":
                     st.warning("Could not understand audio.")
 
     if final_input:
+        history = list(st.session_state.chat_history)
         st.session_state.chat_history.append({"role": "user", "content": final_input})
-        
-        with st.spinner("🤔 Thinking..."):
-            reply_text = get_tutor_response(final_input, st.session_state.chat_history[:-1])
-            
+        # Append the reply up-front so a cancelled stream still leaves its partial text in history
+        msg_obj = {"role": "assistant", "content": "", "is_voice": (input_source == "voice")}
+        st.session_state.chat_history.append(msg_obj)
+
+        st.button("⏹ Stop", key="btn_stop_chat")
+        with st.chat_message("assistant"):
+            stream_box = st.empty()
+            stream_box.markdown("🤔 Thinking...")
+
+        def _save_reply(text):
+            msg_obj["content"] = text
+
+        reply_text = render_stream(get_tutor_response_stream(final_input, history), stream_box, _save_reply)
+
+        with st.spinner("🔊 Preparing audio..."):
             # Generate TTS ONLY if input was voice
             audio_reply = None
             if input_source == "voice" and "None" not in audio_mode:
@@ -1427,11 +1798,9 @@ elif selected_page == "Chat Tutor":
                 except Exception as e:
                     print(f"Browser TTS Error: {e}")
 
-        msg_obj = {"role": "assistant", "content": reply_text, "is_voice": (input_source == "voice")}
         if audio_reply:
              msg_obj["audio"] = audio_reply
         
-        st.session_state.chat_history.append(msg_obj)
         # Auto-save chat history to Supabase (only when logged in; strips audio bytes)
         if _UID:
             save_chat_history(_UID, st.session_state.chat_history)
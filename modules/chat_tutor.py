@@ -1,4 +1,4 @@
-from modules.llm_engine import get_client
+from modules.llm_engine import complete, stream_chat
 
 SYSTEM_PROMPT = """You are StudyBuddy AI, a friendly, patient, and knowledgeable academic tutor.
 Your job is to help students understand concepts, answer questions, clarify doubts, and make learning enjoyable.
@@ -10,23 +10,25 @@ Guidelines:
 - If a student seems confused, offer to re-explain in a different way
 - Keep responses focused and educational"""
 
-def get_tutor_response(user_message: str, history: list[dict]) -> str:
-    """
-    Get a conversational response from the AI tutor.
-    history: list of {"role": "user"/"assistant", "content": "..."}
-    """
-    client = get_client()
-
+def _build_messages(user_message: str, history: list[dict]) -> list[dict]:
     messages = [{"role": "system", "content": SYSTEM_PROMPT}]
     # Include up to last 10 turns for context
     for msg in history[-20:]:
+        # Skip empty turns (e.g. a reply that was cancelled before its first token)
+        if not msg.get("content"):
+            continue
         messages.append({"role": msg["role"], "content": msg["content"]})
     messages.append({"role": "user", "content": user_message})
+    return messages
+
+def get_tutor_response(user_message: str, history: list[dict]) -> str:
+    """
+    Get a conversational response from the AI tutor.
+    history: list of {"role": "user"/"assistant", "content": "..."}
+    """
+    return complete(_build_messages(user_message, history), temperature=0.7, task="chat")
 
-    response = client.chat.completions.create(
-        model="llama-3.3-70b-versatile",
-        messages=messages,
-        temperature=0.7,
-        max_tokens=1024,
-    )
-    return response.choices[0].message.content.strip()
+def get_tutor_response_stream(user_message: str, history: list[dict], cancel_event=None):
+    """Streaming variant of get_tutor_response(): yields reply tokens as they arrive."""
+    yield from stream_chat(_build_messages(user_message, history), temperature=0.7,
+                           cancel_event=cancel_event, task="chat")
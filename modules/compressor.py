@@ -0,0 +1,164 @@
+"""
+compressor.py — Local extractive compression of long notes
+Ranks sentences with TextRank over TF-IDF cosine similarity (vectorized with
+NumPy) and keeps the highest-ranked ones, in their original order, until a
+token budget is met. Used instead of cutting off the tail when notes don't
+fit a request, so the model sees the key sentences of the whole document.
+"""
+
+import os
+import re
+from functools import lru_cache
+
+import numpy as np
+
+from modules.llm_engine import count_tokens, fit_to_budget
+
+ENABLED = os.getenv("LOCAL_COMPRESSION", "1").lower() not in ("0", "false", "no", "off")
+DAMPING = 0.85
+# Larger inputs are ranked in windows so the similarity matrix stays small
+WINDOW_SENTENCES = int(os.getenv("COMPRESSION_WINDOW_SENTENCES", 1500))
+MAX_TERMS = 4096
+
+_SENTENCE_END = re.compile(r"(?<=[.!?])\s+")
+_LINE_BREAK = re.compile(r"\n+")
+_WORD = re.compile(r"\w{2,}")
+_STOPWORDS = frozenset(
+    "the and for are but not you all any can had her was one our out has him his how its may new now "
+    "see two way who did get let say she too use that with have this will your from they been more "
+    "when what which their there than then them these some into also such only very each other "
+    "would about could should where while being those because between through".split()
+)
+
+
+def split_sentences(text: str) -> list[tuple[int, str]]:
+    """(line_index, sentence) pairs; line breaks count as boundaries so bullet lists split per item."""
+    sentences = []
+    for line_index, line in enumerate(_LINE_BREAK.split(text)):
+        for sentence in _SENTENCE_END.split(line.strip()):
+            if sentence.strip():
+                sentences.append((line_index, sentence.strip()))
+    return sentences
+
+
+def _similarity(sentences: list[str]) -> np.ndarray:
+    """Cosine similarity of TF-IDF sentence vectors; only terms shared by 2+ sentences are materialized."""
+    tokens = [[w for w in _WORD.findall(s.lower()) if w not in _STOPWORDS] for s in sentences]
+    vocab: dict[str, int] = {}
+    ids = [np.array([vocab.setdefault(w, len(vocab)) for w in words], dtype=np.int64) for words in tokens]
+    n, v = len(sentences), len(vocab)
+    if not v:
+        return np.zeros((n, n), dtype=np.float32)
+
+    rows = np.repeat(np.arange(n), [len(x) for x in ids])
+    cols = np.concatenate(ids) if rows.size else np.zeros(0, dtype=np.int64)
+    # Term frequencies per (sentence, term) pair, then document frequency per term
+    pairs, tf = np.unique(rows * v + cols, return_counts=True)
+    pair_rows, pair_cols = pairs // v, pairs % v
+    df = np.bincount(pair_cols, minlength=v)
+    weights = tf * np.log((1 + n) / (1 + df[pair_cols])) + 1e-9
+    norms = np.sqrt(np.bincount(pair_rows, weights=weights ** 2, minlength=n))
+    norms[norms == 0] = 1.0
+
+    # A term in a single sentence adds nothing to any dot product
+    shared = np.flatnonzero(df >= 2)
+    if shared.size > MAX_TERMS:
+        shared = shared[np.argsort(-df[shared], kind="stable")[:MAX_TERMS]]
+    column = np.full(v, -1, dtype=np.int64)
+    column[shared] = np.arange(shared.size)
+    keep = column[pair_cols] >= 0
+    matrix = np.zeros((n, shared.size), dtype=np.float32)
+    matrix[pair_rows[keep], column[pair_cols[keep]]] = weights[keep] / norms[pair_rows[keep]]
+    similarity = matrix @ matrix.T
+    np.fill_diagonal(similarity, 0.0)
+    return similarity
+
+
+def textrank(sentences: list[str], iterations: int = 50, tol: float = 1e-6) -> np.ndarray:
+    """PageRank over the sentence similarity graph; higher scores are more central sentences."""
+    n = len(sentences)
+    if n <= 2:
+        return np.ones(n)
+    similarity = _similarity(sentences)
+    out_weight = similarity.sum(axis=1, keepdims=True)
+    # Sentences sharing no terms with any other link to every sentence evenly
+    transition = np.where(out_weight > 0, similarity / np.where(out_weight > 0, out_weight, 1.0), 1.0 / n)
+    scores = np.full(n, 1.0 / n)
+    for _ in range(iterations):
+        updated = (1 - DAMPING) / n + DAMPING * (transition.T @ scores)
+        if np.abs(updated - scores).sum() < tol:
+            return updated
+        scores = updated
+    return scores
+
+
+def compress(text: str, budget: int) -> tuple[str, dict]:
+    """
+    Keep the top-ranked sentences that fit budget tokens, in document order.
+    Returns (text, report) with total/kept tokens and total/kept sentence counts.
+    """
+    kept, report = _compress(text, budget)
+    return kept, dict(report)
+
+
+# The UI sizes a request before sending it, so the same text is often compressed twice
+@lru_cache(maxsize=16)
+def _compress(text: str, budget: int) -> tuple[str, dict]:
+    sentences = split_sentences(text)
+    lengths = np.array([count_tokens(s) + 1 for _, s in sentences])
+    total = count_tokens(text)
+    report = {"total_tokens": total, "kept_tokens": total, "total_sentences": len(sentences),
+              "kept_sentences": len(sentences)}
+    if total <= budget or not sentences:
+        return text, report
+
+    scores = np.empty(len(sentences))
+    for start in range(0, len(sentences), WINDOW_SENTENCES):
+        window = [s for _, s in sentences[start:start + WINDOW_SENTENCES]]
+        # Normalize per window so every part of a long document competes fairly
+        scores[start:start + len(window)] = textrank(window) * len(window)
+
+    chosen = np.zeros(len(sentences), dtype=bool)
+    used = 0
+    for i in np.argsort(-scores, kind="stable"):
+        if used + lengths[i] <= budget:
+            chosen[i] = True
+            used += lengths[i]
+
+    parts = []
+    previous_line = None
+    for keep, (line_index, sentence) in zip(chosen, sentences):
+        if keep:
+            if parts:
+                parts.append(" " if line_index == previous_line else "\n")
+            parts.append(sentence)
+            previous_line = line_index
+    kept = "".join(parts)
+    report.update(kept_tokens=count_tokens(kept), kept_sentences=int(chosen.sum()))
+    return kept, report
+
+
+def fit_or_compress(text: str, task: str = "default", system_prompt: str = "", template: str = "",
+                    max_ratio: float | None = None) -> tuple[str, dict]:
+    """
+    Like llm_engine.fit_to_budget(), but text over the budget is compressed
+    locally instead of losing its tail. Only done when LOCAL_COMPRESSION is on
+    and the text is at most max_ratio times the budget (None = any length).
+    The report then has compressed=True and truncated=False.
+    """
+    fitted, report = fit_to_budget(text, task=task, system_prompt=system_prompt, template=template)
+    if not ENABLED or not report["truncated"] or not report["budget"]:
+        return fitted, report
+    if max_ratio is not None and report["total_tokens"] > max_ratio * report["budget"]:
+        return fitted, report
+    compressed, summary = compress(text, report["budget"])
+    report.update(
+        kept_tokens=summary["kept_tokens"],
+        dropped_tokens=max(0, report["total_tokens"] - summary["kept_tokens"]),
+        dropped_chars=max(0, len(text) - len(compressed)),
+        truncated=False,
+        compressed=True,
+        total_sentences=summary["total_sentences"],
+        kept_sentences=summary["kept_sentences"],
+    )
+    return compressed, report
@@ -1,6 +1,6 @@
 """
 database.py — Supabase data layer for StudyBuddy
-Handles all CRUD operations: notes, quiz results, flashcard sets, chat history.
+Handles all CRUD operations: notes, quiz results, flashcard sets, flashcard reviews, chat history.
 """
 
 import os
@@ -145,38 +145,116 @@ def save_flashcard_set(user_id: str, topic: str, cards: list[dict]) -> bool:
     """Save a flashcard set for a user."""
     try:
         sb = get_supabase()
-        sb.table("flashcard_sets").insert(
-            {"user_id": user_id, "topic": topic, "cards": json.dumps(cards)}
+        result = sb.table("flashcard_sets").insert(
+            {"user_id": user_id, "topic": topic, "cards": json.dumps(cards), "card_count": len(cards)}
         ).execute()
+        # New cards join the user's spaced-repetition reviews, due now
+        if result.data:
+            init_card_reviews(user_id, result.data[0]["id"], len(cards))
         return True
     except Exception as e:
         st.warning(f"⚠️ Could not save flashcard set: {e}")
         return False
 
 
-def get_flashcard_sets(user_id: str) -> list[dict]:
-    """Retrieve all saved flashcard sets for a user, newest first."""
+def get_flashcard_sets(user_id: str, limit: int = 20, offset: int = 0) -> list[dict]:
+    """
+    Retrieve a page of a user's saved flashcard sets, newest first, as
+    {id, topic, card_count, created_at} without the cards themselves
+    (load those with get_flashcard_cards()).
+    """
     try:
         sb = get_supabase()
         result = sb.table("flashcard_sets") \
-            .select("id, topic, cards, created_at") \
+            .select("id, topic, card_count, created_at") \
             .eq("user_id", user_id) \
             .order("created_at", desc=True) \
+            .range(offset, offset + limit - 1) \
             .execute()
-        sets = result.data or []
-        # Parse cards JSON if returned as string
-        for s in sets:
-            if isinstance(s.get("cards"), str):
+        return result.data or []
+    except Exception as e:
+        st.warning(f"⚠️ Could not fetch flashcard sets: {e}")
+        return []
+
+
+def get_flashcard_cards(user_id: str, set_ids: list[str]) -> dict[str, list[dict]]:
+    """Retrieve the cards of the given flashcard sets as {set_id: cards}."""
+    if not set_ids:
+        return {}
+    try:
+        sb = get_supabase()
+        result = sb.table("flashcard_sets") \
+            .select("id, cards") \
+            .eq("user_id", user_id) \
+            .in_("id", list(set_ids)) \
+            .execute()
+        cards = {}
+        for s in result.data or []:
+            value = s.get("cards")
+            if isinstance(value, str):
                 try:
-                    s["cards"] = json.loads(s["cards"])
+                    value = json.loads(value)
                 except Exception:
-                    s["cards"] = []
-        return sets
+                    value = []
+            cards[s["id"]] = value or []
+        return cards
     except Exception as e:
-        st.warning(f"⚠️ Could not fetch flashcard sets: {e}")
+        st.warning(f"⚠️ Could not fetch flashcards: {e}")
+        return {}
+
+
+# ─── Flashcard Reviews (spaced repetition) ──────────────────────────────────
+
+def init_card_reviews(user_id: str, set_id: str, card_count: int) -> bool:
+    """Add review state for a set's cards, leaving cards that already have state untouched."""
+    if card_count <= 0:
+        return True
+    try:
+        sb = get_supabase()
+        sb.table("flashcard_reviews").upsert(
+            [{"user_id": user_id, "set_id": set_id, "card_index": i} for i in range(card_count)],
+            on_conflict="user_id,set_id,card_index",
+            ignore_duplicates=True,
+        ).execute()
+        return True
+    except Exception as e:
+        st.warning(f"⚠️ Could not schedule flashcard reviews: {e}")
+        return False
+
+
+def get_due_reviews(user_id: str, due_before: str, limit: int = 100) -> list[dict]:
+    """Retrieve review state of the cards due by `due_before` (ISO timestamp), soonest first."""
+    try:
+        sb = get_supabase()
+        result = sb.table("flashcard_reviews") \
+            .select("set_id, card_index, ease, interval_days, repetitions, lapses, due_at") \
+            .eq("user_id", user_id) \
+            .lte("due_at", due_before) \
+            .order("due_at") \
+            .limit(limit) \
+            .execute()
+        return result.data or []
+    except Exception as e:
+        st.warning(f"⚠️ Could not fetch flashcard reviews: {e}")
         return []
 
 
+def save_card_reviews(user_id: str, states: list[dict]) -> bool:
+    """Upsert review state rows (as produced by spaced_repetition.ReviewQueue.review())."""
+    if not states:
+        return True
+    try:
+        sb = get_supabase()
+        sb.table("flashcard_reviews").upsert(
+            [{"user_id": user_id, **s} for s in states],
+            on_conflict="user_id,set_id,card_index",
+        ).execute()
+        return True
+    except Exception as e:
+        st.warning(f"⚠️ Could not save flashcard review: {e}")
+        return False
+
+
 # ─── Chat History ────────────────────────────────────────────────────────────
 
 def save_chat_history(user_id: str, messages: list[dict]) -> bool:
@@ -1,4 +1,8 @@
-from modules.llm_engine import generate
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from modules.llm_engine import generate, generate_stream, rate_limit_headroom
+from modules.topic_index import TopicIndex, canonicalize_topic
 
 LEVELS = {
     "🧒 ELI5 (Simple)": "Explain like I'm 5 years old. Use very simple language, short sentences, everyday analogies, and a friendly tone. Avoid jargon.",
@@ -6,8 +10,25 @@ LEVELS = {
     "🔬 Advanced": "Give a comprehensive, in-depth explanation suitable for a graduate student or professional. Include technical details, mechanisms, and real-world applications.",
 }
 
-def explain_topic(topic: str, level: str) -> str:
-    """Explain a topic at the given complexity level."""
+# Routing task per level (see llm_engine.ROUTES)
+LEVEL_TASKS = {
+    "🧒 ELI5 (Simple)": "explain:eli5",
+    "📘 Standard": "explain:standard",
+    "🔬 Advanced": "explain:advanced",
+}
+
+# Recently explained topics per level; near-duplicate phrasings reuse the explanation
+_topic_index = TopicIndex(
+    threshold=float(os.getenv("TOPIC_MATCH_THRESHOLD", 0.8)),
+    max_entries=int(os.getenv("TOPIC_INDEX_ENTRIES", 500)),
+)
+
+def topic_index_stats() -> dict:
+    """Return lookups, exact/near-duplicate hits, misses and hit rate of the topic index."""
+    return _topic_index.stats()
+
+def _build_prompt(topic: str, level: str) -> tuple[str, str]:
+    """Return the (system, prompt) pair for explaining a topic at a level."""
     level_instruction = LEVELS.get(level, LEVELS["📘 Standard"])
     system = (
         "You are an expert educational tutor who excels at breaking down complex topics. "
@@ -20,4 +41,77 @@ def explain_topic(topic: str, level: str) -> str:
         "Please explain this topic following the structure: "
         "## 📖 What is it?, ## 🔍 How it works, ## 🌍 Real-World Example, ## ✅ Quick Summary"
     )
-    return generate(prompt, system_prompt=system)
+    return system, prompt
+
+def explain_topic(topic: str, level: str) -> str:
+    """Explain a topic at the given complexity level."""
+    cached = _topic_index.lookup(topic, level)
+    if cached is not None:
+        return cached
+    system, prompt = _build_prompt(topic, level)
+    result = generate(prompt, system_prompt=system, task=LEVEL_TASKS.get(level, "explain:standard"))
+    if result:
+        _topic_index.add(topic, level, result)
+    return result
+
+def explain_topic_stream(topic: str, level: str, cancel_event=None):
+    """Streaming variant of explain_topic(): yields markdown tokens as they arrive."""
+    cached = _topic_index.lookup(topic, level)
+    if cached is not None:
+        yield cached
+        return
+    system, prompt = _build_prompt(topic, level)
+    parts = []
+    for chunk in generate_stream(prompt, system_prompt=system, cancel_event=cancel_event,
+                                 task=LEVEL_TASKS.get(level, "explain:standard")):
+        parts.append(chunk)
+        yield chunk
+    # Only index answers that weren't cancelled part-way
+    if parts and not (cancel_event is not None and cancel_event.is_set()):
+        _topic_index.add(topic, level, "".join(parts).strip())
+
+# ─── Speculative prefetch of the other levels ───────────────────────────────
+
+# Small shared pool so prefetch never competes much with foreground requests
+_prefetch_pool = ThreadPoolExecutor(max_workers=int(os.getenv("EXPLAIN_PREFETCH_WORKERS", 2)),
+                                    thread_name_prefix="explain-prefetch")
+# Skip prefetching when less than this fraction of the rate-limit budget is free
+PREFETCH_MIN_HEADROOM = float(os.getenv("EXPLAIN_PREFETCH_MIN_HEADROOM", 0.5))
+
+def _prefetch_one(topic: str, level: str, cancel_event: threading.Event) -> str | None:
+    if cancel_event.is_set() or rate_limit_headroom() < PREFETCH_MIN_HEADROOM:
+        return None
+    # Streaming lets cancel_event stop mid-response; completed answers land in the topic index
+    text = "".join(explain_topic_stream(topic, level, cancel_event=cancel_event)).strip()
+    return None if cancel_event.is_set() else text
+
+def start_prefetch(topic: str, level: str) -> dict:
+    """
+    Generate the levels other than `level` for `topic` in the background.
+    Returns a handle {topic, level, event, futures: {level: Future}} for
+    cancel_prefetch(); a future resolves to the explanation, or None if skipped.
+    """
+    cancel_event = threading.Event()
+    futures = {
+        other: _prefetch_pool.submit(_prefetch_one, topic, other, cancel_event)
+        for other in LEVELS if other != level
+    }
+    return {"topic": topic, "level": level, "event": cancel_event, "futures": futures}
+
+def cancel_prefetch(handle: dict | None):
+    """Stop a prefetch: drop queued levels and cut off in-flight streams."""
+    if not handle:
+        return
+    handle["event"].set()
+    for future in handle["futures"].values():
+        future.cancel()
+
+def prefetched(handle: dict | None, topic: str, level: str):
+    """Return the prefetch Future for (topic, level) if one was started for it, else None."""
+    if not handle or handle["event"].is_set():
+        return None
+    if canonicalize_topic(handle["topic"]) != canonicalize_topic(topic):
+        return None
+    future = handle["futures"].get(level)
+    return None if future is None or future.cancelled() else future
+
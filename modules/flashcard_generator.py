@@ -1,35 +1,170 @@
 import json
+import math
+import os
 import re
-from modules.llm_engine import generate
+import threading
+from typing import Iterator
+from modules.llm_engine import generate, generate_json_stream, generate_many, count_tokens
+from modules.compressor import fit_or_compress
+from modules.json_stream import iter_array_items
+from modules.summarizer import split_chunks
+from modules.topic_index import MinHasher, canonicalize_topic, same_words, shingles
 
-def generate_flashcards(content: str, num_cards: int = 8) -> list[dict]:
+# Notes longer than this are split and carded section by section (see generate_flashcards_chunked)
+CHUNK_TOKENS = int(os.getenv("FLASHCARD_CHUNK_TOKENS", 1500))
+MAX_CHUNKS = int(os.getenv("FLASHCARD_MAX_CHUNKS", 8))
+MAX_CARDS_PER_CHUNK = 10
+# Cards requested beyond num_cards, so duplicates can be dropped and coverage still chosen
+OVERSAMPLE = 1.5
+DEDUP_THRESHOLD = float(os.getenv("FLASHCARD_DEDUP_THRESHOLD", 0.7))
+
+_hasher = MinHasher()
+
+def _parse_cards(raw: str) -> list[dict]:
+    """Extract the JSON array of cards from a model response."""
+    match = re.search(r'\[.*\]', raw, re.DOTALL)
+    if match:
+        try:
+            return json.loads(match.group())
+        except json.JSONDecodeError:
+            pass
+
+    try:
+        return json.loads(raw)
+    except Exception:
+        return []
+
+def _is_valid_card(c) -> bool:
+    return isinstance(c, dict) and bool(c.get("front")) and bool(c.get("back"))
+
+def _is_valid_deck(raw: str) -> bool:
+    cards = _parse_cards(raw)
+    return bool(cards) and isinstance(cards, list) and all(_is_valid_card(c) for c in cards)
+
+def _build_prompt(content: str, num_cards: int, json_object: bool = False) -> tuple[str, str]:
     """
-    Generate flashcards from a topic or notes.
-    Returns a list of {front: str, back: str} dicts.
+    Return the (system, prompt) pair for a flashcard request.
+    json_object asks for {"cards": [...]} instead of a bare array (JSON mode needs an object).
     """
+    shape = "JSON object" if json_object else "JSON array"
+    container = 'a JSON object with a single key "cards" holding an array' if json_object else "a JSON array"
     system = (
         "You are an expert educational flashcard creator. "
         "Create concise, clear question-answer pairs that aid memorization. "
-        "You MUST respond with ONLY a valid JSON array, no extra text."
+        f"You MUST respond with ONLY a valid {shape}, no extra text."
     )
     prompt = (
-        f"Content/Topic: {content[:4000]}\n\n"
+        f"Content/Topic: {content}\n\n"
         f"Generate exactly {num_cards} flashcards.\n"
-        'Respond ONLY with a JSON array of objects with keys "front" (question/term) and "back" (answer/definition).\n'
+        f'Respond ONLY with {container} of objects with keys "front" (question/term) and "back" (answer/definition).\n'
         "Make the fronts concise questions or terms, and the backs clear, memorable answers. "
         "Vary between definitions, key facts, formulas, and conceptual questions."
     )
+    return system, prompt
 
-    raw = generate(prompt, system_prompt=system, temperature=0.5)
+def fit_content(content: str, num_cards: int = 8, task: str = "flashcards") -> tuple[str, dict]:
+    """Fit notes to the flashcards route, condensing long ones locally; the report says how much was dropped."""
+    system, template = _build_prompt("", num_cards)
+    return fit_or_compress(content, task=task, system_prompt=system, template=template)
 
-    match = re.search(r'\[.*\]', raw, re.DOTALL)
-    if match:
-        try:
-            return json.loads(match.group())
-        except json.JSONDecodeError:
-            pass
+def generate_flashcards(content: str, num_cards: int = 8) -> list[dict]:
+    """
+    Generate flashcards from a topic or notes.
+    Returns a list of {front: str, back: str} dicts.
+    """
+    content, _ = fit_content(content, num_cards)
+    system, prompt = _build_prompt(content, num_cards)
+    raw = generate(prompt, system_prompt=system, temperature=0.5, task="flashcards", validate=_is_valid_deck)
+    return _parse_cards(raw)
 
+def generate_flashcards_stream(content: str, num_cards: int = 8,
+                               cancel_event: threading.Event | None = None) -> Iterator[dict]:
+    """
+    Streaming variant of generate_flashcards(): yields each {front, back} card
+    as soon as it is complete, falling back to generate_flashcards() if the
+    stream produces no usable card.
+    """
+    content, _ = fit_content(content, num_cards)
+    system, prompt = _build_prompt(content, num_cards, json_object=True)
+    chunks = generate_json_stream(prompt, system_prompt=system, temperature=0.5,
+                                  cancel_event=cancel_event, task="flashcards")
+    count = 0
     try:
-        return json.loads(raw)
-    except Exception:
-        return []
+        for card in iter_array_items(chunks):
+            if _is_valid_card(card) and count < num_cards:
+                count += 1
+                yield card
+    finally:
+        chunks.close()
+    if count == 0 and not (cancel_event is not None and cancel_event.is_set()):
+        yield from generate_flashcards(content, num_cards)
+
+# ─── Chunk-parallel generation for long notes ──────────────────────────────
+
+def needs_chunking(content: str) -> bool:
+    """True when the notes are long enough to be carded section by section."""
+    return count_tokens(content) > CHUNK_TOKENS
+
+def _dedup_fronts(per_chunk: list[list[dict]]) -> list[list[dict]]:
+    """
+    Drop cards whose front nearly repeats an earlier card's front (earlier chunks win).
+    Fronts must also use the same words, so contrast cards like "red" vs "white
+    blood cells" are both kept.
+    """
+    kept_fronts = []
+    unique = []
+    for cards in per_chunk:
+        kept = []
+        for card in cards:
+            front = canonicalize_topic(str(card["front"]))
+            signature = _hasher.signature(shingles(front))
+            if any(MinHasher.similarity(signature, other) >= DEDUP_THRESHOLD and same_words(front, other_front)
+                   for other_front, other in kept_fronts):
+                continue
+            kept_fronts.append((front, signature))
+            kept.append(card)
+        unique.append(kept)
+    return unique
+
+def _select_with_coverage(per_chunk: list[list[dict]], num_cards: int) -> list[dict]:
+    """Take cards round-robin across chunks so every section is represented; returns them in document order."""
+    picked = []
+    for position in range(max((len(cards) for cards in per_chunk), default=0)):
+        for chunk_index, cards in enumerate(per_chunk):
+            if position < len(cards) and len(picked) < num_cards:
+                picked.append((chunk_index, position))
+    return [per_chunk[c][p] for c, p in sorted(picked)]
+
+def generate_flashcards_chunked(content: str, num_cards: int = 8, on_progress=None) -> list[dict]:
+    """
+    Generate flashcards from long notes: split them into at most MAX_CHUNKS
+    sections, card each section concurrently, drop near-duplicate fronts and
+    keep num_cards spread evenly over the document.
+    on_progress(done, total) is called as sections finish.
+    """
+    # split_chunks() may end a chunk once it is half full, so size them for MAX_CHUNKS halves
+    chunk_tokens = max(CHUNK_TOKENS, math.ceil(2 * count_tokens(content) / MAX_CHUNKS))
+    chunks = split_chunks(content, chunk_tokens)
+    if len(chunks) <= 1:
+        return generate_flashcards(content, num_cards)
+
+    per_chunk_count = min(MAX_CARDS_PER_CHUNK, max(2, math.ceil(num_cards * OVERSAMPLE / len(chunks))))
+    prompts = []
+    for chunk in chunks:
+        system, prompt = _build_prompt(fit_content(chunk, per_chunk_count, "flashcards:chunk")[0], per_chunk_count)
+        prompts.append({"prompt": prompt, "system_prompt": system})
+
+    done = 0
+    def _on_result(_result):
+        nonlocal done
+        done += 1
+        if on_progress:
+            on_progress(done, len(chunks))
+
+    results = generate_many(prompts, temperature=0.5, task="flashcards:chunk", validate=_is_valid_deck,
+                            on_result=_on_result)
+    per_chunk = [[c for c in _parse_cards(r["text"]) if _is_valid_card(c)] if r["error"] is None else []
+                 for r in results]
+    cards = _select_with_coverage(_dedup_fronts(per_chunk), num_cards)
+    # Every section failed: fall back to a single request over the condensed notes
+    return cards or generate_flashcards(content, num_cards)
@@ -0,0 +1,162 @@
+"""
+grader.py — Short-answer grading for StudyBuddy quizzes
+All answers of a quiz are scored in one pass against their expected answers
+with normalized token-set overlap and edit-distance similarity (batched
+Levenshtein in NumPy). Only answers with the same words as expected are
+accepted locally and only clear misses rejected; near-misses like
+"absorption" for "adsorption" go to the LLM, together in a single request.
+"""
+
+import json
+import os
+import re
+import unicodedata
+
+import numpy as np
+
+from modules.llm_engine import generate
+
+# Similarity at or below REJECT is wrong; anything short of the same words asks the LLM
+REJECT = float(os.getenv("GRADE_REJECT", 0.35))
+# Word overlap needed for ambiguous answers when the LLM call fails or is disabled;
+# spelling closeness alone never counts, since one letter can change the meaning
+FALLBACK_THRESHOLD = 0.6
+USE_LLM = os.getenv("GRADE_USE_LLM", "1").lower() not in ("0", "false", "no", "off")
+
+_NON_WORD = re.compile(r"[^\w\s]")
+_NUMBER = re.compile(r"\d+(?:\.\d+)?")
+_FILLER = frozenset("the a an of is are was were it its to".split())
+
+
+def normalize_answer(text: str) -> str:
+    """NFKC, lowercase, punctuation and filler words like articles removed, spaces collapsed."""
+    text = unicodedata.normalize("NFKC", str(text)).lower()
+    words = _NON_WORD.sub(" ", text).split()
+    kept = [w for w in words if w not in _FILLER]
+    return " ".join(kept or words)
+
+
+def token_set_similarity(a: str, b: str) -> float:
+    """F1 overlap of the two answers' word sets (1.0 = same words, any order)."""
+    set_a, set_b = set(a.split()), set(b.split())
+    if not set_a or not set_b:
+        return float(set_a == set_b)
+    return 2 * len(set_a & set_b) / (len(set_a) + len(set_b))
+
+
+def edit_similarities(answers: list[str], expected: list[str]) -> np.ndarray:
+    """
+    1 - Levenshtein distance / longer length for every (answer, expected)
+    pair at once: one DP row update per character position covers all pairs.
+    """
+    count = len(answers)
+    if not count:
+        return np.zeros(0)
+    len_a = np.array([len(a) for a in answers])
+    len_b = np.array([len(b) for b in expected])
+    width = int(len_b.max()) + 1
+    # Code points, padded with values that never match the other side
+    codes_a = np.full((count, int(len_a.max())), -1, dtype=np.int64)
+    codes_b = np.full((count, width - 1), -2, dtype=np.int64)
+    for k, (a, b) in enumerate(zip(answers, expected)):
+        codes_a[k, :len(a)] = [ord(c) for c in a]
+        codes_b[k, :len(b)] = [ord(c) for c in b]
+
+    columns = np.arange(width)
+    row = np.tile(columns, (count, 1))
+    distance = row[np.arange(count), len_b].copy()  # answers that are empty
+    for i in range(codes_a.shape[1]):
+        substitute = row[:, :-1] + (codes_b != codes_a[:, i:i + 1])
+        candidate = np.empty_like(row)
+        candidate[:, 0] = i + 1
+        candidate[:, 1:] = np.minimum(row[:, 1:] + 1, substitute)
+        # Insertions chain left to right: row[j] = min over k <= j of candidate[k] + (j - k)
+        row = np.minimum.accumulate(candidate - columns, axis=1) + columns
+        finished = len_a == i + 1
+        distance[finished] = row[finished, len_b[finished]]
+    longest = np.maximum(np.maximum(len_a, len_b), 1)
+    return 1.0 - distance / longest
+
+
+def _build_prompt(items: list[dict]) -> tuple[str, str]:
+    """Return the (system, prompt) pair asking the LLM to judge several answers."""
+    system = (
+        "You are a fair teacher grading short quiz answers. Accept answers that mean the same as the "
+        "expected answer, even if worded differently or slightly misspelled; reject wrong or incomplete ones. "
+        "You MUST respond with ONLY a valid JSON array, no extra text before or after."
+    )
+    lines = [
+        f'{n}. Question: {item["question"]}\n   Expected: {item["expected"]}\n   Student: {item["answer"]}'
+        for n, item in enumerate(items, 1)
+    ]
+    prompt = (
+        "Grade each student answer:\n\n" + "\n".join(lines) + "\n\n"
+        f'Respond ONLY with a JSON array of {len(items)} objects in the same order, each with keys '
+        '"id" (the number above) and "correct" (true or false).'
+    )
+    return system, prompt
+
+
+def _parse_verdicts(raw: str, count: int) -> dict[int, bool] | None:
+    match = re.search(r"\[.*\]", raw or "", re.DOTALL)
+    try:
+        verdicts = json.loads(match.group()) if match else None
+    except json.JSONDecodeError:
+        return None
+    if not isinstance(verdicts, list):
+        return None
+    parsed = {}
+    for v in verdicts:
+        if isinstance(v, dict) and isinstance(v.get("id"), int) and isinstance(v.get("correct"), bool):
+            parsed[v["id"] - 1] = v["correct"]
+    return parsed if all(n in parsed for n in range(count)) else None
+
+
+def _llm_grade(items: list[dict]) -> list[bool] | None:
+    """One request for all ambiguous answers; None when the reply can't be used."""
+    system, prompt = _build_prompt(items)
+    try:
+        raw = generate(prompt, system_prompt=system, temperature=0.0, task="grade",
+                       validate=lambda text: _parse_verdicts(text, len(items)) is not None)
+    except Exception as e:
+        print(f"LLM grading failed: {e}")
+        return None
+    verdicts = _parse_verdicts(raw, len(items))
+    return None if verdicts is None else [verdicts[n] for n in range(len(items))]
+
+
+def grade_answers(items: list[dict]) -> list[dict]:
+    """
+    Grade short answers. items are {question, answer, expected} dicts; returns
+    one {correct, score, method} dict per item in order, where method is
+    "local" (decided by similarity), "llm" or "fallback" (ambiguous, LLM unavailable).
+    """
+    answers = [normalize_answer(item.get("answer", "")) for item in items]
+    expected = [normalize_answer(item.get("expected", "")) for item in items]
+    edit = edit_similarities(answers, expected)
+    results = []
+    ambiguous = []
+    fallback = []
+    for k, (answer, want) in enumerate(zip(answers, expected)):
+        overlap = token_set_similarity(answer, want) if answer else 0.0
+        score = max(overlap, float(edit[k])) if answer else 0.0
+        # "1914" vs "1918" is one character apart but a different answer
+        same_numbers = set(_NUMBER.findall(answer)) == set(_NUMBER.findall(want))
+        fallback.append(same_numbers and overlap >= FALLBACK_THRESHOLD)
+        correct = None
+        if score <= REJECT:
+            correct = False
+        elif (answer == want or overlap == 1.0) and same_numbers:
+            correct = True
+        else:
+            ambiguous.append(k)
+        results.append({"correct": correct, "score": round(score, 3), "method": "local"})
+
+    if ambiguous:
+        verdicts = _llm_grade([items[k] for k in ambiguous]) if USE_LLM else None
+        for n, k in enumerate(ambiguous):
+            if verdicts is not None:
+                results[k].update(correct=verdicts[n], method="llm")
+            else:
+                results[k].update(correct=fallback[k], method="fallback")
+    return results
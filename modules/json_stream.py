@@ -0,0 +1,70 @@
+"""
+json_stream.py — Incremental parsing of streamed JSON arrays
+Feeds LLM output chunk by chunk and yields each object of the first JSON
+array as soon as its closing brace arrives, so quiz questions and
+flashcards can be shown before the whole response has been generated.
+Works for a bare array and for JSON-mode output that wraps the array in an
+object such as {"questions": [...]}.
+"""
+
+import json
+from typing import Iterable, Iterator
+
+
+class JSONArrayStream:
+    """
+    Scans text once, tracking string/escape state and nesting depth.
+    feed() returns the objects of the first array completed by that chunk.
+    """
+
+    def __init__(self):
+        self._buffer = []
+        self._in_string = False
+        self._escaped = False
+        self._depth = 0
+        self._array_depth = None   # depth just inside the items array
+        self._item = None          # characters of the object being read
+        self.done = False
+
+    def feed(self, chunk: str) -> list:
+        items = []
+        for ch in chunk:
+            if self.done:
+                break
+            if self._item is not None:
+                self._item.append(ch)
+            if self._in_string:
+                if self._escaped:
+                    self._escaped = False
+                elif ch == "\\":
+                    self._escaped = True
+                elif ch == '"':
+                    self._in_string = False
+                continue
+            if ch == '"':
+                self._in_string = True
+            elif ch in "[{":
+                self._depth += 1
+                if ch == "[" and self._array_depth is None:
+                    self._array_depth = self._depth
+                elif ch == "{" and self._array_depth is not None and self._depth == self._array_depth + 1:
+                    self._item = [ch]
+            elif ch in "]}":
+                if ch == "}" and self._item is not None and self._depth == self._array_depth + 1:
+                    try:
+                        items.append(json.loads("".join(self._item)))
+                    except json.JSONDecodeError:
+                        pass
+                    self._item = None
+                elif ch == "]" and self._depth == self._array_depth:
+                    self.done = True
+                self._depth -= 1
+        return items
+
+
+def iter_array_items(chunks: Iterable[str]) -> Iterator:
+    """Yield each object of the first JSON array in a stream of text chunks as it completes."""
+    parser = JSONArrayStream()
+    # Keep reading after the array closes so the upstream stream finishes (and gets cached)
+    for chunk in chunks:
+        yield from parser.feed(chunk)
@@ -0,0 +1,185 @@
+"""
+llm_cache.py — Content-addressed response cache for StudyBuddy LLM calls
+Two tiers: an in-process LRU in front of an on-disk SQLite table.
+Entries are keyed by a hash of the full request and expire by TTL and size.
+"""
+
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+
+
+def make_key(**request) -> str:
+    """Hash the full request (model, messages, temperature, ...) into a cache key."""
+    blob = json.dumps(request, sort_keys=True, ensure_ascii=False, separators=(",", ":"))
+    return hashlib.sha256(blob.encode("utf-8")).hexdigest()
+
+
+# ─── Tiers ──────────────────────────────────────────────────────────────────
+
+class MemoryLRU:
+    """Thread-safe in-memory LRU with per-entry TTL."""
+
+    def __init__(self, max_entries: int = 256, ttl: float = 3600):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self._data: OrderedDict[str, tuple[float, dict]] = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: str) -> dict | None:
+        with self._lock:
+            item = self._data.get(key)
+            if item is None:
+                return None
+            stored_at, value = item
+            if time.time() - stored_at > self.ttl:
+                del self._data[key]
+                return None
+            self._data.move_to_end(key)
+            return value
+
+    def set(self, key: str, value: dict, stored_at: float | None = None):
+        with self._lock:
+            self._data[key] = (stored_at or time.time(), value)
+            self._data.move_to_end(key)
+            while len(self._data) > self.max_entries:
+                self._data.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+
+class SQLiteCache:
+    """On-disk tier shared by every session (and process) on the host."""
+
+    def __init__(self, path: str, ttl: float = 7 * 24 * 3600, max_entries: int = 5000):
+        self.path = path
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self._lock = threading.Lock()
+        if os.path.dirname(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+        with self._connect() as conn:
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS llm_cache ("
+                " key TEXT PRIMARY KEY, value TEXT NOT NULL,"
+                " created_at REAL NOT NULL, accessed_at REAL NOT NULL)"
+            )
+            conn.execute("CREATE INDEX IF NOT EXISTS idx_llm_cache_accessed ON llm_cache(accessed_at)")
+
+    def _connect(self) -> sqlite3.Connection:
+        return sqlite3.connect(self.path, timeout=5)
+
+    def get(self, key: str) -> tuple[float, dict] | None:
+        now = time.time()
+        with self._lock, self._connect() as conn:
+            row = conn.execute("SELECT value, created_at FROM llm_cache WHERE key = ?", (key,)).fetchone()
+            if row is None:
+                return None
+            if now - row[1] > self.ttl:
+                conn.execute("DELETE FROM llm_cache WHERE key = ?", (key,))
+                return None
+            conn.execute("UPDATE llm_cache SET accessed_at = ? WHERE key = ?", (now, key))
+            return row[1], json.loads(row[0])
+
+    def set(self, key: str, value: dict):
+        now = time.time()
+        with self._lock, self._connect() as conn:
+            conn.execute(
+                "INSERT OR REPLACE INTO llm_cache (key, value, created_at, accessed_at) VALUES (?, ?, ?, ?)",
+                (key, json.dumps(value, ensure_ascii=False), now, now),
+            )
+            self._evict(conn, now)
+
+    def _evict(self, conn: sqlite3.Connection, now: float):
+        conn.execute("DELETE FROM llm_cache WHERE created_at < ?", (now - self.ttl,))
+        count = conn.execute("SELECT COUNT(*) FROM llm_cache").fetchone()[0]
+        if count > self.max_entries:
+            # Drop the least recently used rows
+            conn.execute(
+                "DELETE FROM llm_cache WHERE key IN ("
+                " SELECT key FROM llm_cache ORDER BY accessed_at ASC LIMIT ?)",
+                (count - self.max_entries,),
+            )
+
+    def clear(self):
+        with self._lock, self._connect() as conn:
+            conn.execute("DELETE FROM llm_cache")
+
+
+# ─── Tiered cache ───────────────────────────────────────────────────────────
+
+class TieredCache:
+    """
+    Memory LRU in front of an optional SQLite tier.
+    Values are dicts like {"text": ..., "latency": ...}; the stored upstream
+    latency lets the stats report how much waiting the cache saved.
+    """
+
+    def __init__(self, memory: MemoryLRU, disk: SQLiteCache | None = None):
+        self.memory = memory
+        self.disk = disk
+        self._lock = threading.Lock()
+        self._stats = {"hits": 0, "memory_hits": 0, "disk_hits": 0, "misses": 0, "saved_seconds": 0.0}
+
+    def get(self, key: str) -> dict | None:
+        value = self.memory.get(key)
+        tier = "memory_hits"
+        if value is None and self.disk is not None:
+            try:
+                found = self.disk.get(key)
+            except sqlite3.Error:
+                found = None
+            if found is not None:
+                stored_at, value = found
+                self.memory.set(key, value, stored_at=stored_at)
+                tier = "disk_hits"
+        with self._lock:
+            if value is None:
+                self._stats["misses"] += 1
+            else:
+                self._stats["hits"] += 1
+                self._stats[tier] += 1
+                self._stats["saved_seconds"] += float(value.get("latency", 0.0))
+        return value
+
+    def set(self, key: str, value: dict):
+        self.memory.set(key, value)
+        if self.disk is not None:
+            try:
+                self.disk.set(key, value)
+            except sqlite3.Error:
+                pass
+
+    def clear(self):
+        self.memory.clear()
+        if self.disk is not None:
+            self.disk.clear()
+
+    def stats(self) -> dict:
+        with self._lock:
+            stats = dict(self._stats)
+        lookups = stats["hits"] + stats["misses"]
+        stats["hit_rate"] = stats["hits"] / lookups if lookups else 0.0
+        return stats
+
+
+def build_default_cache() -> TieredCache | None:
+    """Build the cache from env settings; returns None when LLM_CACHE_DISABLED is set."""
+    if os.getenv("LLM_CACHE_DISABLED", "").lower() in ("1", "true", "yes"):
+        return None
+    ttl = float(os.getenv("LLM_CACHE_TTL", 24 * 3600))
+    memory = MemoryLRU(max_entries=int(os.getenv("LLM_CACHE_MEMORY_ENTRIES", 256)), ttl=ttl)
+    path = os.getenv("LLM_CACHE_PATH", ".cache/llm_cache.sqlite3")
+    disk = None
+    if path:
+        try:
+            disk = SQLiteCache(path, ttl=ttl, max_entries=int(os.getenv("LLM_CACHE_MAX_ENTRIES", 5000)))
+        except (sqlite3.Error, OSError) as e:
+            print(f"LLM disk cache unavailable: {e}")
+    return TieredCache(memory, disk)
@@ -1,42 +1,564 @@
+import json
 import os
+import re
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from typing import Iterator
+from urllib.parse import urlparse
+import httpx
+import groq
 import streamlit as st
-from groq import Groq
+from groq import Groq, AsyncGroq
 from dotenv import load_dotenv
+from modules.llm_cache import make_key, build_default_cache
+from modules.rate_limiter import RateLimiter, estimate_tokens
+from modules import metrics
+
+try:
+    import tiktoken
+except ImportError:
+    tiktoken = None
 
 load_dotenv()
 
-def get_client():
-    """Initialize and return a Groq client."""
-    api_key = os.getenv("GROQ_API_KEY") or st.secrets.get("GROQ_API_KEY", "")
+MODEL = "llama-3.3-70b-versatile"
+FAST_MODEL = "llama-3.1-8b-instant"
+
+# Model + output budget per task. Simple, highly structured tasks go to the
+# fast model; callers that validate output fall back to MODEL on failure.
+ROUTES = {
+    "default":          {"model": MODEL,      "max_tokens": 2048},
+    "explain:eli5":     {"model": FAST_MODEL, "max_tokens": 1024},
+    "explain:standard": {"model": MODEL,      "max_tokens": 1536},
+    "explain:advanced": {"model": MODEL,      "max_tokens": 2048},
+    "summarize":        {"model": MODEL,      "max_tokens": 1536},
+    "summarize:map":    {"model": FAST_MODEL, "max_tokens": 512},
+    "quiz:mcq":         {"model": MODEL,      "max_tokens": 2048},
+    "quiz:tf":          {"model": FAST_MODEL, "max_tokens": 1024},
+    "quiz:sa":          {"model": FAST_MODEL, "max_tokens": 1536},
+    "flashcards":       {"model": FAST_MODEL, "max_tokens": 2048},
+    "flashcards:chunk": {"model": FAST_MODEL, "max_tokens": 1024},
+    "grade":            {"model": FAST_MODEL, "max_tokens": 512},
+    "chat":             {"model": MODEL,      "max_tokens": 1024},
+}
+# Optional JSON overrides, e.g. LLM_ROUTES='{"quiz:mcq": {"model": "llama-3.1-8b-instant"}}'
+for _task, _override in json.loads(os.getenv("LLM_ROUTES", "{}") or "{}").items():
+    ROUTES[_task] = {**ROUTES.get(_task, ROUTES["default"]), **_override}
+
+def resolve_route(task: str = "default") -> dict:
+    """Return the {model, max_tokens} route for a task, falling back to the default route."""
+    return {**ROUTES["default"], **ROUTES.get(task, {})}
+
+# ─── Prompt budgeting ───────────────────────────────────────────────────────
+
+CONTEXT_WINDOWS = {
+    MODEL: 131072,
+    FAST_MODEL: 131072,
+}
+# Headroom for chat-format overhead and tokenizer mismatch (cl100k vs Llama 3)
+BUDGET_SAFETY_TOKENS = 256
+
+_encoder = None
+_encoder_lock = threading.Lock()
+
+def _get_encoder():
+    global _encoder
+    if _encoder is None and tiktoken is not None:
+        with _encoder_lock:
+            if _encoder is None:
+                try:
+                    _encoder = tiktoken.get_encoding("cl100k_base")
+                except Exception:
+                    # e.g. offline and the encoding file isn't cached yet: estimate from then on
+                    _encoder = False
+    return _encoder or None
+
+def count_tokens(text: str) -> int:
+    """Count tokens locally (tiktoken cl100k when installed, else a ~4 chars/token estimate)."""
+    if not text:
+        return 0
+    encoder = _get_encoder()
+    if encoder is not None:
+        return len(encoder.encode(text, disallowed_special=()))
+    return max(1, len(text) // 4)
+
+def input_budget(task: str = "default", system_prompt: str = "", template: str = "") -> int:
+    """
+    Tokens left for user content on a task's route: the model's context window
+    (capped by the TPM budget, since one request can't exceed it) minus the
+    system prompt, the prompt template and the reserved max_tokens.
+    """
+    route = resolve_route(task)
+    window = CONTEXT_WINDOWS.get(route["model"], 8192)
+    if _limiter.tokens is not None:
+        window = min(window, int(_limiter.tokens.capacity))
+    used = count_tokens(system_prompt) + count_tokens(template) + route["max_tokens"] + BUDGET_SAFETY_TOKENS
+    return max(0, window - used)
+
+_PARAGRAPH_END = re.compile(r"\n\s*\n")
+_SENTENCE_END = re.compile(r"(?<=[.!?])\s+")
+_WORD_END = re.compile(r"\s+")
+
+def _cut_points(text: str, pattern: re.Pattern, start: int, stop: int) -> list[int]:
+    points = [m.start() for m in pattern.finditer(text, start, stop)]
+    points.append(stop)
+    return points
+
+def fit_to_budget(text: str, task: str = "default", system_prompt: str = "", template: str = "",
+                  budget: int | None = None) -> tuple[str, dict]:
+    """
+    Trim text to the task's input budget, cutting at the last paragraph that
+    fits, then sentence, then word boundaries. Returns (text, report) where
+    report has total/kept/dropped tokens, dropped characters and the budget.
+    """
+    if budget is None:
+        budget = input_budget(task, system_prompt, template)
+    total = count_tokens(text)
+    report = {"budget": budget, "total_tokens": total, "kept_tokens": total,
+              "dropped_tokens": 0, "dropped_chars": 0, "truncated": False}
+    if total <= budget:
+        return text, report
+
+    end = 0
+    used = 0
+    # Walk coarse-to-fine: whole paragraphs, then sentences of the next one.
+    # Words are a last resort for text without any sentence punctuation.
+    for pattern in (_PARAGRAPH_END, _SENTENCE_END, _WORD_END):
+        if pattern is _WORD_END and end > 0:
+            break
+        for point in _cut_points(text, pattern, end, len(text)):
+            if point <= end:
+                continue
+            n = count_tokens(text[end:point])
+            if used + n > budget:
+                break
+            used += n
+            end = point
+        else:
+            break
+
+    kept = text[:end].rstrip()
+    report.update(kept_tokens=used, dropped_tokens=max(0, total - used),
+                  dropped_chars=len(text) - len(kept), truncated=True)
+    return kept, report
+
+_route_stats: dict[str, dict] = {}
+_route_lock = threading.Lock()
+
+def _route_entry(task: str) -> dict:
+    # Caller holds _route_lock
+    return _route_stats.setdefault(task, {"calls": 0, "total_seconds": 0.0, "max_seconds": 0.0,
+                                          "fallbacks": 0, "models": {}})
+
+def _record_route(task: str, model: str, seconds: float, fallback: bool = False):
+    with _route_lock:
+        entry = _route_entry(task)
+        entry["calls"] += 1
+        entry["total_seconds"] += seconds
+        entry["max_seconds"] = max(entry["max_seconds"], seconds)
+        entry["fallbacks"] += fallback
+        entry["models"][model] = entry["models"].get(model, 0) + 1
+
+def route_stats() -> dict:
+    """Per-task call counts, average/max latency (seconds), model usage and fallbacks."""
+    with _route_lock:
+        return {
+            task: {**entry, "models": dict(entry["models"]),
+                   "avg_seconds": entry["total_seconds"] / entry["calls"] if entry["calls"] else 0.0}
+            for task, entry in _route_stats.items()
+        }
+
+# Process-wide response cache (memory LRU + SQLite); swap with set_cache()
+_cache = build_default_cache()
+
+def set_cache(cache):
+    """Plug in a different cache (any object with get(key)/set(key, value)), or None to disable."""
+    global _cache
+    _cache = cache
+
+def cache_stats() -> dict:
+    """Return cache hit/miss counters and the upstream seconds saved by hits."""
+    if _cache is None or not hasattr(_cache, "stats"):
+        return {}
+    return _cache.stats()
+
+# Connection pool settings shared by the sync and async clients
+POOL_SIZE = int(os.getenv("GROQ_POOL_SIZE", 20))
+REQUEST_TIMEOUT = float(os.getenv("GROQ_TIMEOUT", 60))
+CONNECT_TIMEOUT = float(os.getenv("GROQ_CONNECT_TIMEOUT", 10))
+KEEPALIVE_EXPIRY = float(os.getenv("GROQ_KEEPALIVE_EXPIRY", 60))
+# Upper bound on concurrent requests from one generate_many() call
+BATCH_CONCURRENCY = int(os.getenv("GROQ_BATCH_CONCURRENCY", 4))
+
+# Process-wide rate limits (defaults match Groq's free tier for the 70B model / Whisper)
+_limiter = RateLimiter(
+    rpm=float(os.getenv("GROQ_RPM", 30)),
+    tpm=float(os.getenv("GROQ_TPM", 12000)),
+    max_retries=int(os.getenv("GROQ_MAX_RETRIES", 4)),
+)
+_whisper_limiter = RateLimiter(
+    rpm=float(os.getenv("GROQ_WHISPER_RPM", 20)),
+    max_retries=int(os.getenv("GROQ_MAX_RETRIES", 4)),
+)
+
+def rate_limit_stats() -> dict:
+    """Return limiter counters (calls, retries, 429s, seconds spent waiting for budget)."""
+    return {"chat": _limiter.stats(), "whisper": _whisper_limiter.stats()}
+
+def rate_limit_headroom() -> float:
+    """Fraction of the chat RPM/TPM budget currently free; background work should back off when low."""
+    return _limiter.headroom()
+
+def _uses_local_backend() -> bool:
+    """True when GROQ_BASE_URL points at a local stand-in such as benchmarks/fake_groq.py."""
+    host = urlparse(os.getenv("GROQ_BASE_URL", "")).hostname
+    return host in ("127.0.0.1", "localhost", "::1")
+
+def _get_api_key() -> str:
+    api_key = os.getenv("GROQ_API_KEY")
+    if not api_key and _uses_local_backend():
+        # The local fake backend accepts any key; don't require real credentials
+        return "local-no-key"
+    api_key = api_key or st.secrets.get("GROQ_API_KEY", "")
     if not api_key or api_key == "your_groq_api_key_here":
         st.error("⚠️ GROQ_API_KEY is not set. Please add your key to the `.env` file.")
         st.stop()
-    return Groq(api_key=api_key)
+        # st.stop() only halts inside a Streamlit script run; fail loudly elsewhere
+        raise RuntimeError("GROQ_API_KEY is not set")
+    return api_key
 
-def generate(prompt: str, system_prompt: str = "You are a helpful AI study assistant.", temperature: float = 0.7) -> str:
-    """Send a prompt to the LLM and return the response text."""
-    client = get_client()
-    response = client.chat.completions.create(
-        model="llama-3.3-70b-versatile",
-        messages=[
-            {"role": "system", "content": system_prompt},
-            {"role": "user", "content": prompt},
-        ],
-        temperature=temperature,
-        max_tokens=2048,
+def _pool_limits() -> httpx.Limits:
+    return httpx.Limits(
+        max_connections=POOL_SIZE,
+        max_keepalive_connections=POOL_SIZE,
+        keepalive_expiry=KEEPALIVE_EXPIRY,
     )
-    return response.choices[0].message.content.strip()
+
+def _timeout() -> httpx.Timeout:
+    return httpx.Timeout(REQUEST_TIMEOUT, connect=CONNECT_TIMEOUT)
+
+@st.cache_resource
+def _build_client(api_key: str) -> Groq:
+    """One Groq client per API key for the whole process; httpx keeps its connections alive."""
+    http_client = httpx.Client(limits=_pool_limits(), timeout=_timeout())
+    # Retries are owned by the rate limiter, which knows about the shared budget
+    return Groq(api_key=api_key, http_client=http_client, timeout=_timeout(), max_retries=0)
+
+@st.cache_resource
+def _build_async_client(api_key: str) -> AsyncGroq:
+    """Async counterpart of _build_client(); use it from one long-lived event loop."""
+    http_client = httpx.AsyncClient(limits=_pool_limits(), timeout=_timeout())
+    return AsyncGroq(api_key=api_key, http_client=http_client, timeout=_timeout(), max_retries=0)
+
+class SingleFlight:
+    """
+    Collapse concurrent calls that share a key into one execution.
+    The first caller (leader) runs the function; callers arriving while it is
+    in flight wait and receive the same result, or the same exception.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._calls: dict[str, dict] = {}
+        self._stats = {"leaders": 0, "followers": 0}
+
+    def do(self, key: str, fn):
+        with self._lock:
+            call = self._calls.get(key)
+            leader = call is None
+            if leader:
+                call = {"done": threading.Event(), "result": None, "error": None}
+                self._calls[key] = call
+                self._stats["leaders"] += 1
+            else:
+                self._stats["followers"] += 1
+
+        if not leader:
+            call["done"].wait()
+            if call["error"] is not None:
+                raise call["error"]
+            return call["result"]
+
+        try:
+            call["result"] = fn()
+            return call["result"]
+        except Exception as e:
+            call["error"] = e
+            raise
+        except BaseException:
+            # e.g. Streamlit stopping the leader's script run; don't leak that into other sessions
+            call["error"] = RuntimeError("Shared LLM request was interrupted; please retry.")
+            raise
+        finally:
+            with self._lock:
+                self._calls.pop(key, None)
+            call["done"].set()
+
+    def stats(self) -> dict:
+        with self._lock:
+            return dict(self._stats, in_flight=len(self._calls))
+
+# Identical in-flight completions share one upstream request
+_inflight = SingleFlight()
+
+def inflight_stats() -> dict:
+    """Return how many completions led an upstream call vs piggybacked on one."""
+    return _inflight.stats()
+
+def get_client() -> Groq:
+    """Return the shared, thread-safe Groq client (pooled HTTP keep-alive connections)."""
+    return _build_client(_get_api_key())
+
+def get_async_client() -> AsyncGroq:
+    """Return the shared AsyncGroq client."""
+    return _build_async_client(_get_api_key())
+
+def _build_messages(prompt: str, system_prompt: str) -> list[dict]:
+    return [
+        {"role": "system", "content": system_prompt},
+        {"role": "user", "content": prompt},
+    ]
+
+def complete(messages: list[dict], temperature: float = 0.7, max_tokens: int | None = None,
+             use_cache: bool = True, task: str = "default", model: str | None = None, validate=None) -> str:
+    """
+    Run a chat completion and return the text, serving repeats from the response cache.
+    The model and max_tokens come from the task's route unless given explicitly.
+    Responses that fail validate(text) are returned but not cached.
+    """
+    route = resolve_route(task)
+    model = model or route["model"]
+    max_tokens = max_tokens or route["max_tokens"]
+    started = time.monotonic()
+    key = make_key(model=model, messages=messages, temperature=temperature, max_tokens=max_tokens)
+    if use_cache and _cache is not None:
+        hit = _cache.get(key)
+        if hit is not None:
+            metrics.record(task, model, time.monotonic() - started, cache="hit")
+            return hit["text"]
+    cache_status = "miss" if use_cache else "bypass"
+
+    def _call_upstream() -> str:
+        client = get_client()
+        try:
+            raw = _limiter.call(
+                lambda: client.chat.completions.with_raw_response.create(
+                    model=model,
+                    messages=messages,
+                    temperature=temperature,
+                    max_tokens=max_tokens,
+                ),
+                est_tokens=estimate_tokens(messages),
+            )
+            response = raw.parse()
+        except Exception:
+            metrics.record(task, model, time.monotonic() - started, cache=cache_status, status="error")
+            raise
+        usage = response.usage
+        if usage:
+            _limiter.record_usage(usage.completion_tokens)
+        text = response.choices[0].message.content.strip()
+        latency = time.monotonic() - started
+        metrics.record(task, model, latency, cache=cache_status,
+                       prompt_tokens=usage.prompt_tokens if usage else None,
+                       completion_tokens=usage.completion_tokens if usage else None)
+        if _cache is not None and text and (validate is None or validate(text)):
+            _cache.set(key, {"text": text, "latency": latency})
+        return text
+
+    text = _inflight.do(key, _call_upstream)
+    _record_route(task, model, time.monotonic() - started)
+    return text
+
+def generate(prompt: str, system_prompt: str = "You are a helpful AI study assistant.", temperature: float = 0.7,
+             use_cache: bool = True, task: str = "default", validate=None) -> str:
+    """
+    Send a prompt to the LLM and return the response text.
+    If validate(text) returns False and the task is routed to a smaller model,
+    the request is retried once on MODEL.
+    """
+    messages = _build_messages(prompt, system_prompt)
+    text = complete(messages, temperature=temperature, use_cache=use_cache, task=task, validate=validate)
+    if validate is not None and not validate(text) and resolve_route(task)["model"] != MODEL:
+        text = complete(messages, temperature=temperature, use_cache=use_cache, task=task, model=MODEL,
+                        validate=validate)
+        # The first call may have been a cache hit, which records no route entry
+        with _route_lock:
+            _route_entry(task)["fallbacks"] += 1
+    return text
+
+def generate_many(prompts: list, system_prompt: str = "You are a helpful AI study assistant.",
+                  temperature: float = 0.7, use_cache: bool = True, task: str = "default", validate=None,
+                  max_concurrency: int | None = None, on_result=None) -> list[dict]:
+    """
+    Run many generate() calls over a bounded thread pool and return one
+    {"index", "text", "error"} dict per prompt, in input order. Each prompt is
+    a string or a dict of generate() keyword overrides (prompt, system_prompt,
+    task, ...). A failed item carries its exception and leaves the others
+    untouched. Every call still goes through the cache, single-flight and
+    rate limiter, so concurrency never exceeds the RPM/TPM budget.
+    on_result(result) is called from the caller's thread as items finish.
+    """
+    requests = []
+    for prompt in prompts:
+        kwargs = {"system_prompt": system_prompt, "temperature": temperature,
+                  "use_cache": use_cache, "task": task, "validate": validate}
+        kwargs.update(prompt if isinstance(prompt, dict) else {"prompt": prompt})
+        requests.append(kwargs)
+    results = [{"index": i, "text": None, "error": None} for i in range(len(requests))]
+    if not requests:
+        return results
+
+    workers = max(1, min(max_concurrency or BATCH_CONCURRENCY, len(requests)))
+    with ThreadPoolExecutor(max_workers=workers, thread_name_prefix="generate-many") as pool:
+        futures = {pool.submit(generate, **kwargs): i for i, kwargs in enumerate(requests)}
+        for future in as_completed(futures):
+            result = results[futures[future]]
+            try:
+                result["text"] = future.result()
+            except Exception as e:
+                result["error"] = e
+            if on_result is not None:
+                on_result(result)
+    return results
+
+def stream_chat(messages: list[dict], temperature: float = 0.7, max_tokens: int | None = None,
+                cancel_event: threading.Event | None = None, use_cache: bool = True,
+                task: str = "default", model: str | None = None,
+                response_format: dict | None = None) -> Iterator[str]:
+    """
+    Stream a chat completion, yielding text deltas as they arrive.
+    Setting cancel_event (or closing the generator) stops reading and closes the HTTP stream.
+    A cache hit is yielded as a single chunk; only fully received responses are cached.
+    response_format (e.g. {"type": "json_object"}) is passed through for JSON mode.
+    """
+    route = resolve_route(task)
+    model = model or route["model"]
+    max_tokens = max_tokens or route["max_tokens"]
+    started = time.monotonic()
+    extra = {"response_format": response_format} if response_format else {}
+    key = make_key(model=model, messages=messages, temperature=temperature, max_tokens=max_tokens, **extra)
+    if use_cache and _cache is not None:
+        hit = _cache.get(key)
+        if hit is not None:
+            metrics.record(task, model, time.monotonic() - started, cache="hit", stream=True)
+            yield hit["text"]
+            return
+    cache_status = "miss" if use_cache else "bypass"
+
+    client = get_client()
+    try:
+        raw = _limiter.call(
+            lambda: client.chat.completions.with_raw_response.create(
+                model=model,
+                messages=messages,
+                temperature=temperature,
+                max_tokens=max_tokens,
+                stream=True,
+                **extra,
+            ),
+            est_tokens=estimate_tokens(messages),
+        )
+        stream = raw.parse()
+    except Exception:
+        metrics.record(task, model, time.monotonic() - started, cache=cache_status, status="error", stream=True)
+        raise
+    parts = []
+    finished = False
+    ttft = None
+    usage = None
+    status = "error"
+    try:
+        for chunk in stream:
+            if cancel_event is not None and cancel_event.is_set():
+                break
+            # Groq reports token usage on the final chunk
+            x_groq = getattr(chunk, "x_groq", None)
+            if x_groq is not None and getattr(x_groq, "usage", None):
+                usage = x_groq.usage
+            if not chunk.choices:
+                continue
+            delta = chunk.choices[0].delta.content
+            if delta:
+                if ttft is None:
+                    ttft = time.monotonic() - started
+                parts.append(delta)
+                yield delta
+            if chunk.choices[0].finish_reason:
+                finished = True
+        status = "ok" if finished else "cancelled"
+    except GeneratorExit:
+        status = "cancelled"
+        raise
+    finally:
+        stream.close()
+        completion_tokens = usage.completion_tokens if usage else count_tokens("".join(parts))
+        _limiter.record_usage(completion_tokens)
+        metrics.record(task, model, time.monotonic() - started, ttft=ttft, cache=cache_status,
+                       status=status, stream=True, completion_tokens=completion_tokens,
+                       prompt_tokens=usage.prompt_tokens if usage else None)
+
+    text = "".join(parts).strip()
+    if finished:
+        _record_route(task, model, time.monotonic() - started)
+        if _cache is not None and text:
+            _cache.set(key, {"text": text, "latency": time.monotonic() - started})
+
+def generate_stream(prompt: str, system_prompt: str = "You are a helpful AI study assistant.", temperature: float = 0.7,
+                    cancel_event: threading.Event | None = None, use_cache: bool = True,
+                    task: str = "default") -> Iterator[str]:
+    """Streaming variant of generate(): yields response tokens as they arrive."""
+    yield from stream_chat(_build_messages(prompt, system_prompt), temperature=temperature,
+                           cancel_event=cancel_event, use_cache=use_cache, task=task)
+
+def generate_json_stream(prompt: str, system_prompt: str = "You are a helpful AI study assistant.",
+                         temperature: float = 0.7, cancel_event: threading.Event | None = None,
+                         use_cache: bool = True, task: str = "default") -> Iterator[str]:
+    """
+    Streaming generate() in JSON mode (the prompt must ask for a JSON object).
+    If the endpoint rejects JSON mode for streamed requests, the same prompt is
+    streamed without it and the caller's parser copes with any stray text.
+    """
+    messages = _build_messages(prompt, system_prompt)
+    chunks = stream_chat(messages, temperature=temperature, cancel_event=cancel_event, use_cache=use_cache,
+                         task=task, response_format={"type": "json_object"})
+    try:
+        first = next(chunks)
+    except StopIteration:
+        return
+    except groq.BadRequestError:
+        chunks = stream_chat(messages, temperature=temperature, cancel_event=cancel_event,
+                             use_cache=use_cache, task=task)
+        first = next(chunks, None)
+        if first is None:
+            return
+    try:
+        yield first
+        yield from chunks
+    finally:
+        chunks.close()
 
 def transcribe_audio(audio_file) -> str:
     """Transcribe audio file-like object using Groq Whisper."""
     client = get_client()
-    try:
-        transcription = client.audio.transcriptions.create(
+
+    def _request():
+        # Rewind so a retried upload sends the whole recording again
+        if hasattr(audio_file, "seek"):
+            audio_file.seek(0)
+        return client.audio.transcriptions.with_raw_response.create(
             file=("audio.wav", audio_file), # Filename is required
             model="whisper-large-v3",
             response_format="text"
         )
+
+    started = time.monotonic()
+    try:
+        transcription = _whisper_limiter.call(_request).parse()
+        metrics.record("transcribe", "whisper-large-v3", time.monotonic() - started, cache="bypass")
         return transcription
     except Exception as e:
+        metrics.record("transcribe", "whisper-large-v3", time.monotonic() - started, cache="bypass", status="error")
         st.error(f"Transcription error: {e}")
         return ""
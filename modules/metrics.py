@@ -0,0 +1,164 @@
+"""
+metrics.py — Call metrics for StudyBuddy's LLM and Whisper requests
+Every call is appended to a rotating JSONL trace and kept in a bounded
+in-memory window, from which p50/p95/p99 latency and time-to-first-token
+are aggregated for the admin panel and a Prometheus-text endpoint.
+"""
+
+import json
+import logging
+import os
+import threading
+import time
+from collections import deque
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from logging.handlers import RotatingFileHandler
+
+WINDOW = int(os.getenv("LLM_METRICS_WINDOW", 2000))
+QUANTILES = (0.5, 0.95, 0.99)
+
+_lock = threading.Lock()
+_records: deque = deque(maxlen=WINDOW)
+_counters: dict[tuple, int] = {}
+_trace_logger = None
+
+
+def _get_trace_logger():
+    """JSONL trace at LLM_TRACE_PATH, rotated by size; set LLM_TRACE_PATH= (empty) to disable."""
+    global _trace_logger
+    if _trace_logger is None:
+        logger = logging.getLogger("studybuddy.llm_trace")
+        logger.propagate = False
+        logger.setLevel(logging.INFO)
+        path = os.getenv("LLM_TRACE_PATH", ".cache/llm_trace.jsonl")
+        if path and not logger.handlers:
+            try:
+                if os.path.dirname(path):
+                    os.makedirs(os.path.dirname(path), exist_ok=True)
+                handler = RotatingFileHandler(
+                    path,
+                    maxBytes=int(os.getenv("LLM_TRACE_MAX_BYTES", 5 * 1024 * 1024)),
+                    backupCount=int(os.getenv("LLM_TRACE_BACKUPS", 3)),
+                    encoding="utf-8",
+                )
+                handler.setFormatter(logging.Formatter("%(message)s"))
+                logger.addHandler(handler)
+            except OSError as e:
+                print(f"LLM trace disabled: {e}")
+        _trace_logger = logger
+    return _trace_logger
+
+
+def record(feature: str, model: str, latency: float, ttft: float | None = None,
+           prompt_tokens: int | None = None, completion_tokens: int | None = None,
+           cache: str = "miss", status: str = "ok", stream: bool = False):
+    """Record one call. cache is "hit", "miss" or "bypass"; status is "ok", "error" or "cancelled"."""
+    entry = {
+        "ts": round(time.time(), 3),
+        "feature": feature,
+        "model": model,
+        "latency": round(latency, 4),
+        "ttft": round(ttft, 4) if ttft is not None else None,
+        "prompt_tokens": prompt_tokens,
+        "completion_tokens": completion_tokens,
+        "cache": cache,
+        "status": status,
+        "stream": stream,
+    }
+    with _lock:
+        _records.append(entry)
+        key = (feature, model, cache, status)
+        _counters[key] = _counters.get(key, 0) + 1
+    try:
+        _get_trace_logger().info(json.dumps(entry))
+    except Exception:
+        pass
+
+
+def _quantiles(values: list[float]) -> dict[str, float]:
+    if not values:
+        return {}
+    ordered = sorted(values)
+    return {
+        f"p{int(q * 100)}": ordered[min(len(ordered) - 1, int(q * len(ordered)))]
+        for q in QUANTILES
+    }
+
+
+def summary() -> dict:
+    """Aggregate the recent window per feature: counts, cache hit rate, tokens, latency/TTFT quantiles."""
+    with _lock:
+        records = list(_records)
+    by_feature: dict[str, list[dict]] = {}
+    for r in records:
+        by_feature.setdefault(r["feature"], []).append(r)
+
+    result = {}
+    for feature, rows in sorted(by_feature.items()):
+        hits = sum(r["cache"] == "hit" for r in rows)
+        upstream = [r for r in rows if r["cache"] != "hit" and r["status"] == "ok"]
+        result[feature] = {
+            "calls": len(rows),
+            "errors": sum(r["status"] == "error" for r in rows),
+            "cache_hit_rate": hits / len(rows),
+            "prompt_tokens": sum(r["prompt_tokens"] or 0 for r in rows),
+            "completion_tokens": sum(r["completion_tokens"] or 0 for r in rows),
+            "latency": _quantiles([r["latency"] for r in upstream]),
+            "ttft": _quantiles([r["ttft"] for r in upstream if r["ttft"] is not None]),
+        }
+    return result
+
+
+def _escape(value: str) -> str:
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def prometheus_text() -> str:
+    """Render counters and latency/TTFT quantiles in the Prometheus text exposition format."""
+    lines = [
+        "# HELP studybuddy_llm_calls_total LLM and Whisper calls by feature, model, cache status and outcome.",
+        "# TYPE studybuddy_llm_calls_total counter",
+    ]
+    with _lock:
+        counters = dict(_counters)
+    for (feature, model, cache, status), count in sorted(counters.items()):
+        lines.append(
+            f'studybuddy_llm_calls_total{{feature="{_escape(feature)}",model="{_escape(model)}",'
+            f'cache="{cache}",status="{status}"}} {count}'
+        )
+    for metric, field, help_text in (
+        ("studybuddy_llm_latency_seconds", "latency", "Upstream call latency over the recent window."),
+        ("studybuddy_llm_ttft_seconds", "ttft", "Time to first streamed token over the recent window."),
+    ):
+        lines.append(f"# HELP {metric} {help_text}")
+        lines.append(f"# TYPE {metric} summary")
+        for feature, stats in summary().items():
+            for name, value in stats[field].items():
+                quantile = int(name[1:]) / 100
+                lines.append(f'{metric}{{feature="{_escape(feature)}",quantile="{quantile}"}} {value}')
+    return "\n".join(lines) + "\n"
+
+
+class _MetricsHandler(BaseHTTPRequestHandler):
+    def log_message(self, format, *args):
+        pass
+
+    def do_GET(self):
+        if self.path.rstrip("/") != "/metrics":
+            self.send_response(404)
+            self.end_headers()
+            return
+        body = prometheus_text().encode("utf-8")
+        self.send_response(200)
+        self.send_header("Content-Type", "text/plain; version=0.0.4")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+
+def start_metrics_server(port: int, host: str = "127.0.0.1") -> ThreadingHTTPServer:
+    """Serve /metrics for Prometheus scraping on a daemon thread."""
+    server = ThreadingHTTPServer((host, port), _MetricsHandler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
@@ -0,0 +1,167 @@
+"""
+pdf_backends.py — Interchangeable PDF text extraction libraries
+PyPDF2 (the default, always installed) plus optional pypdf, pdfminer.six and
+PyMuPDF backends. Pick one with PDF_BACKEND; pdf_extract runs the selected
+backend inside its sandboxed worker processes.
+"""
+
+import io
+import os
+from abc import ABC, abstractmethod
+
+import PyPDF2
+
+try:
+    import pypdf
+except ImportError:
+    pypdf = None
+
+try:
+    from pdfminer.converter import TextConverter
+    from pdfminer.layout import LAParams
+    from pdfminer.pdfinterp import PDFPageInterpreter, PDFResourceManager
+    from pdfminer.pdfpage import PDFPage
+except ImportError:
+    PDFPage = None
+
+try:
+    import pymupdf
+except ImportError:
+    try:
+        import fitz as pymupdf  # PyMuPDF < 1.24
+    except ImportError:
+        pymupdf = None
+
+DEFAULT_BACKEND = "pypdf2"
+
+
+class PDFBackend(ABC):
+    """
+    One extraction library. open() returns a document handle that
+    page_count() and page_text() accept; subclasses must implement all three.
+    """
+
+    name = ""
+    package = ""  # pip package that provides it
+
+    def available(self) -> bool:
+        return True
+
+    @abstractmethod
+    def open(self, path: str):
+        ...
+
+    @abstractmethod
+    def page_count(self, doc) -> int:
+        ...
+
+    @abstractmethod
+    def page_text(self, doc, index: int) -> str:
+        ...
+
+
+class PyPDF2Backend(PDFBackend):
+    name = "pypdf2"
+    package = "PyPDF2"
+
+    def open(self, path):
+        return PyPDF2.PdfReader(path)
+
+    def page_count(self, doc):
+        return len(doc.pages)
+
+    def page_text(self, doc, index):
+        return doc.pages[index].extract_text() or ""
+
+
+class PypdfBackend(PyPDF2Backend):
+    """pypdf: PyPDF2's maintained successor, with better text ordering and spacing."""
+
+    name = "pypdf"
+    package = "pypdf"
+
+    def available(self):
+        return pypdf is not None
+
+    def open(self, path):
+        return pypdf.PdfReader(path)
+
+
+class PdfminerBackend(PDFBackend):
+    """pdfminer.six: slower, but the best layout fidelity of the pure-Python options."""
+
+    name = "pdfminer"
+    package = "pdfminer.six"
+
+    def available(self):
+        return PDFPage is not None
+
+    def open(self, path):
+        with open(path, "rb") as f:
+            data = io.BytesIO(f.read())
+        # Parse the page tree once; each page's content is only interpreted on demand
+        return {"pages": list(PDFPage.get_pages(data)), "resources": PDFResourceManager(), "data": data}
+
+    def page_count(self, doc):
+        return len(doc["pages"])
+
+    def page_text(self, doc, index):
+        out = io.StringIO()
+        device = TextConverter(doc["resources"], out, laparams=LAParams())
+        try:
+            PDFPageInterpreter(doc["resources"], device).process_page(doc["pages"][index])
+        finally:
+            device.close()
+        return out.getvalue().strip()
+
+
+class PyMuPDFBackend(PDFBackend):
+    """PyMuPDF (MuPDF bindings): native code, usually the fastest by a wide margin."""
+
+    name = "pymupdf"
+    package = "pymupdf"
+
+    def available(self):
+        return pymupdf is not None
+
+    def open(self, path):
+        return pymupdf.open(path)
+
+    def page_count(self, doc):
+        return doc.page_count
+
+    def page_text(self, doc, index):
+        return doc[index].get_text().strip()
+
+
+BACKENDS = {b.name: b for b in (PyPDF2Backend(), PypdfBackend(), PdfminerBackend(), PyMuPDFBackend())}
+
+
+def available_backends() -> list[str]:
+    return [name for name, backend in BACKENDS.items() if backend.available()]
+
+
+def _requested(name: str | None) -> str:
+    return (name or os.getenv("PDF_BACKEND", DEFAULT_BACKEND)).strip().lower()
+
+
+def fallback_reason(name: str | None = None) -> str:
+    """Why get_backend(name) falls back to PyPDF2, or "" when the choice is usable."""
+    name = _requested(name)
+    backend = BACKENDS.get(name)
+    if backend is None:
+        return f"PDF backend {name!r} is unknown; using {DEFAULT_BACKEND}."
+    if not backend.available():
+        return f"PDF backend {name!r} is not installed (pip install {backend.package}); using {DEFAULT_BACKEND}."
+    return ""
+
+
+def get_backend(name: str | None = None) -> PDFBackend:
+    """
+    The named backend, or PDF_BACKEND's. An unknown or uninstalled choice
+    falls back to PyPDF2 rather than failing uploads; fallback_reason() says why.
+    """
+    backend = BACKENDS.get(_requested(name))
+    if backend is None or not backend.available():
+        return BACKENDS[DEFAULT_BACKEND]
+    return backend
@@ -0,0 +1,415 @@
+"""
+pdf_extract.py — Sandboxed, page-parallel PDF text extraction for StudyBuddy
+All parsing happens in worker processes with a memory cap, under a per-job
+wall-clock timeout and page cap, so one pathological upload cannot stall the
+Streamlit server. The timeout starts when the job's first task starts running
+and is enforced by the workers themselves, so time spent queued behind other
+uploads doesn't count and a timed-out job never stops another job's workers. Pages are extracted in batches and streamed back in page
+order, with per-page text cached by file hash + page index so re-reading the
+same upload (or a different page range of it) skips pages already done.
+"""
+
+import hashlib
+import multiprocessing
+import os
+import re
+import shutil
+import signal
+import sqlite3
+import tempfile
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor, TimeoutError as FuturesTimeout
+from concurrent.futures.process import BrokenProcessPool
+from contextlib import contextmanager
+from typing import Iterable, Iterator
+
+from modules.llm_cache import MemoryLRU, SQLiteCache, TieredCache, make_key
+from modules.pdf_backends import fallback_reason, get_backend
+
+try:
+    import resource
+except ImportError:  # Windows: no per-process memory limit
+    resource = None
+
+WORKERS = int(os.getenv("PDF_WORKERS", min(4, os.cpu_count() or 1)))
+PAGES_PER_TASK = int(os.getenv("PDF_PAGES_PER_TASK", 16))
+# Per-job limits: wall-clock seconds, worker address space (MB, 0 = none), pages read
+TIMEOUT = float(os.getenv("PDF_TIMEOUT", 60))
+MEMORY_MB = int(os.getenv("PDF_MEMORY_MB", 1024))
+MAX_PAGES = int(os.getenv("PDF_MAX_PAGES", 500))
+# A worker its own timer can't interrupt (stuck in native code) is killed this long after the limit
+KILL_GRACE = 2.0
+# How often a job waiting for its first task to start checks again
+_START_POLL = 0.05
+# Extraction library (see pdf_backends); resolved once so a bad value is reported once
+BACKEND = get_backend().name
+
+_RANGE_PART = re.compile(r"^\s*(\d*)\s*(?:-\s*(\d*)\s*)?$")
+
+
+def read_bytes(source) -> bytes:
+    """Bytes of an upload (Streamlit UploadedFile), file object, path or raw bytes."""
+    if isinstance(source, (bytes, bytearray)):
+        return bytes(source)
+    if isinstance(source, (str, os.PathLike)):
+        with open(source, "rb") as f:
+            return f.read()
+    if hasattr(source, "getvalue"):
+        return source.getvalue()
+    # Reset file pointer to beginning to avoid empty reads on reruns
+    if hasattr(source, "seek"):
+        source.seek(0)
+    return source.read()
+
+
+def file_digest(data: bytes) -> str:
+    return hashlib.sha256(data).hexdigest()
+
+
+def parse_page_range(spec: str, page_count: int) -> list[int]:
+    """
+    Turn a 1-based spec like "1-5, 8, 12-" into sorted 0-based page indices.
+    Empty means every page; out-of-range pages are dropped.
+    """
+    if not spec or not spec.strip():
+        return list(range(page_count))
+    pages = set()
+    for part in spec.split(","):
+        if not part.strip():
+            continue
+        match = _RANGE_PART.match(part)
+        if not match or not (match.group(1) or match.group(2)):
+            raise ValueError(f"Invalid page range: {part.strip()!r}")
+        start = int(match.group(1)) if match.group(1) else 1
+        if "-" in part:
+            stop = int(match.group(2)) if match.group(2) else page_count
+        else:
+            stop = start
+        pages.update(range(max(1, start) - 1, min(stop, page_count)))
+    return sorted(pages)
+
+
+class ExtractionLimitError(Exception):
+    """Raised by iter_pages() once a job hits a limit; the pages before it were already yielded."""
+
+    def __init__(self, status: str, message: str):
+        super().__init__(message)
+        self.status = status
+
+
+class _WorkerCrashed(Exception):
+    pass
+
+
+class _JobTimeout(BaseException):
+    """
+    Raised inside a worker when its job's time limit runs out. A BaseException,
+    like KeyboardInterrupt, so parsers' broad "except Exception" can't swallow it.
+    """
+
+
+# ─── Page cache ─────────────────────────────────────────────────────────────
+
+def _build_page_cache() -> TieredCache | None:
+    """Per-page text keyed by file hash + page; PDF_PAGE_CACHE_PATH= (empty) keeps it in memory only."""
+    if os.getenv("LLM_CACHE_DISABLED", "").lower() in ("1", "true", "yes"):
+        return None
+    ttl = float(os.getenv("PDF_PAGE_CACHE_TTL", 7 * 24 * 3600))
+    memory = MemoryLRU(max_entries=int(os.getenv("PDF_PAGE_MEMORY_ENTRIES", 2000)), ttl=ttl)
+    path = os.getenv("PDF_PAGE_CACHE_PATH", ".cache/pdf_pages.sqlite3")
+    disk = None
+    if path:
+        try:
+            disk = SQLiteCache(path, ttl=ttl, max_entries=int(os.getenv("PDF_PAGE_MAX_ENTRIES", 50000)))
+        except (sqlite3.Error, OSError) as e:
+            print(f"PDF page cache unavailable: {e}")
+    return TieredCache(memory, disk)
+
+_page_cache = _build_page_cache()
+
+def set_page_cache(cache):
+    """Swap the page cache (None disables it)."""
+    global _page_cache
+    _page_cache = cache
+
+def page_cache_stats() -> dict:
+    return _page_cache.stats() if _page_cache is not None else {}
+
+def _page_key(digest: str, page: int, backend: str) -> str:
+    # Backends extract differently, so each keeps its own page text
+    return make_key(kind="pdf_page", file=digest, page=page, backend=backend)
+
+def _meta_key(digest: str) -> str:
+    return make_key(kind="pdf_meta", file=digest)
+
+
+# ─── Worker pool ────────────────────────────────────────────────────────────
+
+_pool = None
+_pool_lock = threading.Lock()
+
+def _limit_worker(memory_mb: int):
+    """Worker initializer: cap the address space so a runaway parse raises MemoryError."""
+    if resource is not None and memory_mb:
+        limit = memory_mb * 1024 * 1024
+        resource.setrlimit(resource.RLIMIT_AS, (limit, limit))
+
+def _get_pool() -> ProcessPoolExecutor:
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            # spawn, not fork: forking the threaded Streamlit server is unsafe
+            _pool = ProcessPoolExecutor(max_workers=WORKERS, mp_context=multiprocessing.get_context("spawn"),
+                                        initializer=_limit_worker, initargs=(MEMORY_MB,))
+        return _pool
+
+def _discard_pool(pool: ProcessPoolExecutor, kill: Iterable[int] = ()):
+    """Drop a pool so the next job starts fresh; kill lists the pids of workers stuck on a timed-out job."""
+    global _pool
+    kill = list(kill)
+    with _pool_lock:
+        if _pool is pool:
+            _pool = None
+    processes = getattr(pool, "_processes", None) or {}
+    for pid in kill:
+        process = processes.get(pid)
+        if process is not None:
+            process.kill()
+    # The pool fails its own pending futures once it notices the dead workers
+    pool.shutdown(wait=False, cancel_futures=not kill)
+
+# Each job has a temp directory holding the PDF, a "started" file created by its
+# first task to run (its mtime starts the time limit) and a "<pid>.running" file
+# per worker busy with one of its tasks.
+
+def _started_at(job_dir: str) -> float | None:
+    try:
+        return os.stat(os.path.join(job_dir, "started")).st_mtime
+    except OSError:
+        return None
+
+def _running_pids(job_dir: str) -> list[int]:
+    try:
+        names = os.listdir(job_dir)
+    except OSError:
+        return []
+    return [int(name.split(".")[0]) for name in names if name.endswith(".running")]
+
+def _on_alarm(signum, frame):
+    raise _JobTimeout()
+
+@contextmanager
+def _time_limit(seconds: float):
+    """Worker: raise _JobTimeout in the task once seconds have passed (checked only at the start on Windows)."""
+    if seconds <= 0:
+        raise _JobTimeout()
+    if not hasattr(signal, "setitimer"):
+        yield
+        return
+    previous = signal.signal(signal.SIGALRM, _on_alarm)
+    signal.setitimer(signal.ITIMER_REAL, seconds)
+    try:
+        yield
+    finally:
+        signal.setitimer(signal.ITIMER_REAL, 0)
+        signal.signal(signal.SIGALRM, previous)
+
+def _run_job_task(job_dir: str, timeout: float, fn, *args):
+    """Worker: run one task of a job with whatever is left of the job's time limit."""
+    try:
+        # Exclusive create: only the job's first task sets the start time
+        os.close(os.open(os.path.join(job_dir, "started"), os.O_CREAT | os.O_EXCL | os.O_WRONLY))
+    except FileExistsError:
+        pass
+    started = _started_at(job_dir)
+    running = os.path.join(job_dir, f"{os.getpid()}.running")
+    open(running, "w").close()
+    try:
+        with _time_limit(started + timeout - time.time()):
+            return fn(*args)
+    finally:
+        try:
+            os.remove(running)
+        except OSError:
+            pass
+
+def _count_pages(path: str, backend: str) -> int:
+    """Worker: open the PDF and count its pages."""
+    extractor = get_backend(backend)
+    return extractor.page_count(extractor.open(path))
+
+def _extract_range(path: str, pages: list[int], backend: str) -> tuple[list[tuple[int, str]], str | None]:
+    """Worker: open the PDF once and extract a batch of pages; stops early at the memory cap."""
+    extractor = get_backend(backend)
+    done = []
+    try:
+        doc = extractor.open(path)
+        for i in pages:
+            done.append((i, extractor.page_text(doc, i)))
+    except MemoryError:
+        return done, "memory_limit"
+    except _JobTimeout:
+        return done, "timeout"
+    return done, None
+
+def _batches(pages: list[int], size: int) -> list[list[int]]:
+    return [pages[i:i + size] for i in range(0, len(pages), size)]
+
+_LIMIT_MESSAGES = {
+    "timeout": f"Stopped after the {TIMEOUT:g}s extraction time limit.",
+    "memory_limit": f"A page needed more than the {MEMORY_MB} MB extraction memory limit.",
+}
+
+def _wait(future, job_dir: str, pool: ProcessPoolExecutor):
+    while True:
+        started = _started_at(job_dir)
+        if started is None:
+            # Still queued behind other jobs: the time limit hasn't started
+            wait = _START_POLL
+        else:
+            wait = max(0.0, started + TIMEOUT + KILL_GRACE - time.time())
+        try:
+            return future.result(timeout=wait)
+        except FuturesTimeout:
+            if started is None:
+                continue
+            # The worker's own timer didn't stop it: kill only the workers running this job
+            _discard_pool(pool, kill=_running_pids(job_dir))
+            raise ExtractionLimitError("timeout", _LIMIT_MESSAGES["timeout"]) from None
+        except _JobTimeout:
+            raise ExtractionLimitError("timeout", _LIMIT_MESSAGES["timeout"]) from None
+        except BrokenProcessPool:
+            _discard_pool(pool)
+            raise _WorkerCrashed()
+        except MemoryError:
+            raise ExtractionLimitError("memory_limit", f"The PDF needs more than {MEMORY_MB} MB to open.")
+
+
+# ─── Extraction ─────────────────────────────────────────────────────────────
+
+def iter_pages(source, pages: Iterable[int] | str | None = None,
+               backend: str | None = None) -> Iterator[tuple[int, str]]:
+    """
+    Yield (page_index, text) in page order as pages become available.
+    pages limits extraction to those 0-based indices, or to a 1-based range
+    spec such as "1-20, 35" (see parse_page_range()); backend overrides PDF_BACKEND.
+    Cached pages are yielded immediately; the rest are parsed in batches on
+    the worker pool. When the job exceeds PDF_TIMEOUT, PDF_MEMORY_MB or
+    PDF_MAX_PAGES, the pages extracted so far are yielded and then
+    ExtractionLimitError says which limit was hit.
+    """
+    backend = get_backend(backend).name if backend else BACKEND
+    data = read_bytes(source)
+    digest = file_digest(data)
+    meta = _page_cache.get(_meta_key(digest)) if _page_cache is not None else None
+    total = meta["pages"] if meta is not None else None
+    wanted = None
+    done: dict[int, str] = {}
+    position = 0  # next page of the capped selection to yield
+    job_dir = None
+    futures = []
+
+    def _store(i: int, text: str):
+        if _page_cache is not None:
+            _page_cache.set(_page_key(digest, i, backend), {"text": text})
+
+    def _submit(pool: ProcessPoolExecutor, fn, *args):
+        # Workers read the PDF from a temp file instead of each receiving a pickled copy
+        nonlocal job_dir
+        if job_dir is None:
+            job_dir = tempfile.mkdtemp(prefix="pdf-job-")
+            with open(os.path.join(job_dir, "source.pdf"), "wb") as f:
+                f.write(data)
+        return pool.submit(_run_job_task, job_dir, TIMEOUT, fn, os.path.join(job_dir, "source.pdf"), *args)
+
+    try:
+        # A worker that crashes (e.g. killed while another job timed out) gets one retry
+        for attempt in range(2):
+            pool = None
+            try:
+                if total is None:
+                    pool = _get_pool()
+                    total = _wait(_submit(pool, _count_pages, backend), job_dir, pool)
+                    if _page_cache is not None:
+                        _page_cache.set(_meta_key(digest), {"pages": total})
+                if wanted is None:
+                    if isinstance(pages, str):
+                        wanted = parse_page_range(pages, total)
+                    elif pages is not None:
+                        wanted = sorted({i for i in pages if 0 <= i < total})
+                    else:
+                        wanted = list(range(total))
+                    capped = wanted[:MAX_PAGES]
+                    if _page_cache is not None:
+                        for i in capped:
+                            hit = _page_cache.get(_page_key(digest, i, backend))
+                            if hit is not None:
+                                done[i] = hit["text"]
+
+                missing = [i for i in capped[position:] if i not in done]
+                if missing:
+                    pool = pool or _get_pool()
+                    batch_size = max(1, min(PAGES_PER_TASK, -(-len(missing) // WORKERS)))
+                    futures = [_submit(pool, _extract_range, batch, backend)
+                               for batch in _batches(missing, batch_size)]
+                pending = iter(futures)
+                failure = None
+                while position < len(capped):
+                    i = capped[position]
+                    while i not in done:
+                        if failure is not None:
+                            raise failure
+                        extracted, problem = _wait(next(pending), job_dir, pool)
+                        for page, text in extracted:
+                            done[page] = text
+                            _store(page, text)
+                        if problem:
+                            failure = ExtractionLimitError(problem, _LIMIT_MESSAGES[problem])
+                    yield i, done[i]
+                    position += 1
+                break
+            except _WorkerCrashed:
+                if attempt:
+                    raise ExtractionLimitError("crashed", "The extraction worker stopped unexpectedly.")
+            finally:
+                if pool is not None and pool is _pool:
+                    for future in futures:
+                        future.cancel()
+                futures = []
+    finally:
+        if job_dir is not None:
+            shutil.rmtree(job_dir, ignore_errors=True)
+    if len(wanted) > len(capped):
+        raise ExtractionLimitError("page_limit", f"Only the first {MAX_PAGES} pages were read.")
+
+
+def extract_pdf(source, pages: Iterable[int] | str | None = None, backend: str | None = None) -> dict:
+    """
+    Extract text without raising: returns {"text", "pages", "status", "message"}.
+    status is "ok", or "timeout" / "memory_limit" / "page_limit" / "crashed"
+    with the partial text of the pages read before the limit, or "error".
+    With status "ok", message notes a PDF_BACKEND choice that fell back to PyPDF2.
+    """
+    extracted = []
+    status, message = "ok", ""
+    try:
+        for i, text in iter_pages(source, pages, backend):
+            extracted.append((i, text))
+    except ExtractionLimitError as e:
+        status, message = e.status, str(e)
+    except Exception as e:
+        status, message = "error", str(e)
+    if status == "ok":
+        message = fallback_reason(backend)
+    return {
+        "text": "\n".join(text for _, text in extracted if text).strip(),
+        "pages": [i for i, _ in extracted],
+        "status": status,
+        "message": message,
+    }
+
+
+def extract_text(source, pages: Iterable[int] | str | None = None, backend: str | None = None) -> str:
+    """Full text of the selected pages, one page per line block (raises on failure or limits)."""
+    return "\n".join(text for _, text in iter_pages(source, pages, backend) if text).strip()
@@ -0,0 +1,180 @@
+"""
+question_bank.py — Pre-generated quiz questions per topic and quiz type
+Questions are generated in batches in the background and kept in a shared,
+bounded pool per (topic, quiz type). Near-duplicate questions are dropped
+when MinHash over character shingles finds a candidate with the same words
+(see topic_index), so "mitosis" vs "meiosis" questions both stay, and each session
+draws questions without replacement, so "Generate Quiz" and "Try Again" can
+be served instantly with questions the student hasn't seen yet.
+"""
+
+import hashlib
+import os
+import random
+import re
+import threading
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+
+from modules.llm_engine import rate_limit_headroom
+from modules.quiz_generator import generate_quiz
+from modules.topic_index import MinHasher, canonicalize_topic, same_words, shingles
+
+# Questions generated per background fill, and the unseen count that triggers one
+BATCH_SIZE = int(os.getenv("QUIZ_POOL_BATCH", 10))
+LOW_WATERMARK = int(os.getenv("QUIZ_POOL_LOW", 10))
+# Questions kept per (topic, type); the oldest are dropped beyond this
+MAX_QUESTIONS = int(os.getenv("QUIZ_POOL_MAX_QUESTIONS", 100))
+MAX_POOLS = int(os.getenv("QUIZ_POOL_TOPICS", 200))
+DEDUP_THRESHOLD = float(os.getenv("QUIZ_DEDUP_THRESHOLD", 0.7))
+# Skip background fills when less than this fraction of the rate-limit budget is free
+MIN_HEADROOM = float(os.getenv("QUIZ_POOL_MIN_HEADROOM", 0.5))
+# How many existing questions a fill prompt lists as "do not repeat"
+EXCLUDE_IN_PROMPT = 25
+
+_NUMBER = re.compile(r"\d+")
+
+_fill_pool = ThreadPoolExecutor(max_workers=int(os.getenv("QUIZ_POOL_WORKERS", 2)),
+                                thread_name_prefix="quiz-pool")
+
+
+def pool_key(content: str, quiz_type: str) -> str:
+    """Pool identifier: the canonical topic or notes text plus quiz type."""
+    canonical = canonicalize_topic(content)
+    return hashlib.sha256(f"{quiz_type}\n{canonical}".encode("utf-8")).hexdigest()[:32]
+
+
+class _Pool:
+    def __init__(self):
+        self.questions: OrderedDict[int, dict] = OrderedDict()  # id -> question, oldest first
+        self.signatures: dict[int, tuple] = {}
+        self.texts: dict[int, str] = {}  # canonical question text
+        self.numbers: dict[int, set] = {}
+        self.next_id = 0
+        self.filling = None  # Future of the background fill in flight
+
+
+class QuestionBank:
+    """
+    Shared question pools. take() samples questions the caller hasn't seen,
+    add() stores new ones (returning the ids of their near-duplicates when
+    already present) and refill() tops a pool up in the background.
+    Callers keep the set of ids they have seen; take() and add() update it.
+    """
+
+    def __init__(self):
+        self._pools: OrderedDict[str, _Pool] = OrderedDict()
+        self._hasher = MinHasher()
+        self._lock = threading.Lock()
+        self._stats = {"served": 0, "misses": 0, "fills": 0, "added": 0, "duplicates": 0}
+
+    def _pool(self, key: str) -> _Pool:
+        # Caller holds the lock
+        pool = self._pools.get(key)
+        if pool is None:
+            pool = self._pools[key] = _Pool()
+            while len(self._pools) > MAX_POOLS:
+                self._pools.popitem(last=False)
+        self._pools.move_to_end(key)
+        return pool
+
+    def _find_duplicate(self, pool: _Pool, text: str, signature: tuple, numbers: set) -> int | None:
+        for qid, other in pool.signatures.items():
+            # "in 1914" vs "in 1918" look alike but ask different things, and so do
+            # "red" vs "white blood cells", so a duplicate also needs the same words
+            if pool.numbers[qid] == numbers and MinHasher.similarity(signature, other) >= DEDUP_THRESHOLD \
+                    and same_words(text, pool.texts[qid]):
+                return qid
+        return None
+
+    def add(self, content: str, quiz_type: str, questions: list[dict], seen: set | None = None) -> list[int]:
+        """Store questions, skipping near-duplicates; returns their ids and marks them in seen if given."""
+        prepared = []
+        for q in questions:
+            canonical = canonicalize_topic(str(q.get("question", "")))
+            prepared.append((q, canonical, self._hasher.signature(shingles(canonical)),
+                             set(_NUMBER.findall(canonical))))
+        ids = []
+        with self._lock:
+            pool = self._pool(pool_key(content, quiz_type))
+            for q, canonical, signature, numbers in prepared:
+                qid = self._find_duplicate(pool, canonical, signature, numbers)
+                if qid is not None:
+                    self._stats["duplicates"] += 1
+                else:
+                    qid = pool.next_id
+                    pool.next_id += 1
+                    pool.questions[qid] = q
+                    pool.signatures[qid] = signature
+                    pool.texts[qid] = canonical
+                    pool.numbers[qid] = numbers
+                    self._stats["added"] += 1
+                ids.append(qid)
+            while len(pool.questions) > MAX_QUESTIONS:
+                qid, _ = pool.questions.popitem(last=False)
+                del pool.signatures[qid], pool.texts[qid], pool.numbers[qid]
+        if seen is not None:
+            seen.update(ids)
+        return ids
+
+    def available(self, content: str, quiz_type: str, seen: set) -> int:
+        """Number of pooled questions not in seen."""
+        with self._lock:
+            pool = self._pools.get(pool_key(content, quiz_type))
+            return 0 if pool is None else sum(qid not in seen for qid in pool.questions)
+
+    def take(self, content: str, quiz_type: str, n: int, seen: set) -> list[dict]:
+        """
+        Randomly pick n questions not in seen and add them to seen.
+        Returns [] (taking nothing) when fewer than n unseen questions are pooled.
+        """
+        with self._lock:
+            pool = self._pools.get(pool_key(content, quiz_type))
+            unseen = [] if pool is None else [qid for qid in pool.questions if qid not in seen]
+            if len(unseen) < n:
+                self._stats["misses"] += 1
+                return []
+            picked = random.sample(unseen, n)
+            self._stats["served"] += n
+            questions = [pool.questions[qid] for qid in picked]
+        seen.update(picked)
+        return questions
+
+    def refill(self, content: str, quiz_type: str, seen: set, wanted: int = 0):
+        """
+        Start a background fill when fewer than max(LOW_WATERMARK, wanted)
+        unseen questions remain and none is already running. Returns the Future, or None.
+        """
+        if self.available(content, quiz_type, seen) >= max(LOW_WATERMARK, wanted):
+            return None
+        with self._lock:
+            pool = self._pool(pool_key(content, quiz_type))
+            if pool.filling is not None and not pool.filling.done():
+                return None
+            pool.filling = _fill_pool.submit(self._fill, content, quiz_type)
+            return pool.filling
+
+    def _fill(self, content: str, quiz_type: str) -> int:
+        if rate_limit_headroom() < MIN_HEADROOM:
+            return 0
+        with self._lock:
+            pool = self._pools.get(pool_key(content, quiz_type))
+            recent = [] if pool is None else [q.get("question", "") for q in pool.questions.values()]
+        # Listing recent questions varies the prompt, so the response cache doesn't replay a batch
+        exclude = recent[-EXCLUDE_IN_PROMPT:] or None
+        try:
+            questions = generate_quiz(content, BATCH_SIZE, quiz_type, exclude=exclude)
+        except Exception as e:
+            print(f"Quiz pool fill failed: {e}")
+            return 0
+        with self._lock:
+            self._stats["fills"] += 1
+        return len(self.add(content, quiz_type, questions))
+
+    def stats(self) -> dict:
+        with self._lock:
+            return dict(self._stats, pools=len(self._pools),
+                        questions=sum(len(p.questions) for p in self._pools.values()))
+
+
+question_bank = QuestionBank()
@@ -1,58 +1,128 @@
 import json
 import re
-from modules.llm_engine import generate
+import threading
+from typing import Iterator
+from modules.llm_engine import generate, generate_json_stream
+from modules.compressor import fit_or_compress
+from modules.json_stream import iter_array_items
 
-def generate_quiz(content: str, num_questions: int = 5, quiz_type: str = "MCQ") -> list[dict]:
+# Routing task per quiz type (see llm_engine.ROUTES)
+QUIZ_TASKS = {
+    "MCQ": "quiz:mcq",
+    "True/False": "quiz:tf",
+    "Short Answer": "quiz:sa",
+}
+
+def _parse_questions(raw: str) -> list[dict]:
+    """Extract the JSON array of questions from a model response."""
+    # Extract JSON from response robustly
+    match = re.search(r'\[.*\]', raw, re.DOTALL)
+    if match:
+        try:
+            return json.loads(match.group())
+        except json.JSONDecodeError:
+            pass
+
+    # Fallback: attempt full parse
+    try:
+        return json.loads(raw)
+    except Exception:
+        return []
+
+def _is_valid_question(q) -> bool:
+    return isinstance(q, dict) and bool(q.get("question")) and "answer" in q
+
+def _is_valid_quiz(raw: str) -> bool:
+    questions = _parse_questions(raw)
+    return bool(questions) and isinstance(questions, list) and all(_is_valid_question(q) for q in questions)
+
+def _build_prompt(content: str, num_questions: int, quiz_type: str, json_object: bool = False,
+                  exclude: list[str] | None = None) -> tuple[str, str]:
     """
-    Generate quiz questions from a topic or notes.
-    Returns a list of question dicts.
-    MCQ: {type, question, options: [A,B,C,D], answer, explanation}
-    True/False: {type, question, answer: True/False, explanation}
-    Short Answer: {type, question, answer, explanation}
+    Return the (system, prompt) pair for a quiz request.
+    json_object asks for {"questions": [...]} instead of a bare array (JSON mode needs an object);
+    exclude lists questions already asked, which the new ones must not repeat.
     """
+    shape = "JSON object" if json_object else "JSON array"
     system = (
         "You are an expert quiz creator for students. Generate clear, educational quiz questions. "
-        "You MUST respond with ONLY a valid JSON array, no extra text before or after."
+        f"You MUST respond with ONLY a valid {shape}, no extra text before or after."
     )
 
     if quiz_type == "MCQ":
         format_desc = (
-            'a JSON array of objects, each with keys: '
+            'objects, each with keys: '
             '"type" (always "mcq"), "question", "options" (array of 4 strings like ["A) ...", "B) ...", "C) ...", "D) ..."]), '
             '"answer" (the correct option letter, e.g. "A"), "explanation" (brief reason why)'
         )
     elif quiz_type == "True/False":
         format_desc = (
-            'a JSON array of objects, each with keys: '
+            'objects, each with keys: '
             '"type" (always "tf"), "question", '
             '"answer" (string "True" or "False"), "explanation" (brief reason why)'
         )
     else:  # Short Answer
         format_desc = (
-            'a JSON array of objects, each with keys: '
+            'objects, each with keys: '
             '"type" (always "sa"), "question", '
             '"answer" (a concise correct answer), "explanation" (brief elaboration)'
         )
 
+    if json_object:
+        format_desc = f'a JSON object with a single key "questions" holding an array of {format_desc}'
+    else:
+        format_desc = f"a JSON array of {format_desc}"
+
     prompt = (
-        f"Content/Topic: {content[:4000]}\n\n"
+        f"Content/Topic: {content}\n\n"
         f"Generate exactly {num_questions} {quiz_type} questions about this content.\n"
         f"Respond ONLY with {format_desc}.\n"
         "Ensure questions are varied, educational, and test real understanding."
     )
+    if exclude:
+        prompt += "\nDo NOT repeat or rephrase any of these existing questions:\n" + "\n".join(f"- {q}" for q in exclude)
+    return system, prompt
 
-    raw = generate(prompt, system_prompt=system, temperature=0.6)
+def fit_content(content: str, num_questions: int = 5, quiz_type: str = "MCQ",
+                exclude: list[str] | None = None) -> tuple[str, dict]:
+    """Fit notes to the quiz route, condensing long ones locally; the report says how much was dropped."""
+    system, template = _build_prompt("", num_questions, quiz_type, exclude=exclude)
+    return fit_or_compress(content, task=QUIZ_TASKS.get(quiz_type, "quiz:mcq"),
+                           system_prompt=system, template=template)
 
-    # Extract JSON from response robustly
-    match = re.search(r'\[.*\]', raw, re.DOTALL)
-    if match:
-        try:
-            return json.loads(match.group())
-        except json.JSONDecodeError:
-            pass
+def generate_quiz(content: str, num_questions: int = 5, quiz_type: str = "MCQ",
+                  exclude: list[str] | None = None) -> list[dict]:
+    """
+    Generate quiz questions from a topic or notes, avoiding the questions in exclude.
+    Returns a list of question dicts.
+    MCQ: {type, question, options: [A,B,C,D], answer, explanation}
+    True/False: {type, question, answer: True/False, explanation}
+    Short Answer: {type, question, answer, explanation}
+    """
+    content, _ = fit_content(content, num_questions, quiz_type, exclude)
+    system, prompt = _build_prompt(content, num_questions, quiz_type, exclude=exclude)
+    raw = generate(prompt, system_prompt=system, temperature=0.6,
+                   task=QUIZ_TASKS.get(quiz_type, "quiz:mcq"), validate=_is_valid_quiz)
+    return _parse_questions(raw)
 
-    # Fallback: attempt full parse
+def generate_quiz_stream(content: str, num_questions: int = 5, quiz_type: str = "MCQ",
+                         cancel_event: threading.Event | None = None) -> Iterator[dict]:
+    """
+    Streaming variant of generate_quiz(): yields each question dict as soon
+    as the model has finished writing it. If the stream produces no usable
+    question, falls back to generate_quiz() (which retries on the larger model).
+    """
+    content, _ = fit_content(content, num_questions, quiz_type)
+    system, prompt = _build_prompt(content, num_questions, quiz_type, json_object=True)
+    chunks = generate_json_stream(prompt, system_prompt=system, temperature=0.6,
+                                  cancel_event=cancel_event, task=QUIZ_TASKS.get(quiz_type, "quiz:mcq"))
+    count = 0
     try:
-        return json.loads(raw)
-    except Exception:
-        return []
+        for question in iter_array_items(chunks):
+            if _is_valid_question(question) and count < num_questions:
+                count += 1
+                yield question
+    finally:
+        chunks.close()
+    if count == 0 and not (cancel_event is not None and cancel_event.is_set()):
+        yield from generate_quiz(content, num_questions, quiz_type)
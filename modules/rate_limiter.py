@@ -0,0 +1,205 @@
+"""
+rate_limiter.py — Process-wide Groq rate limiting for StudyBuddy
+Token buckets for requests-per-minute and tokens-per-minute, plus jittered
+exponential backoff on 429 / 503 responses. The tokens bucket is adapted from
+the x-ratelimit-*-tokens headers; Groq's x-ratelimit-*-requests headers count
+requests per day, so an exhausted quota that won't reset within max_delay fails
+calls fast instead (a shorter reset is waited out like any other 429).
+"""
+
+import random
+import re
+import threading
+import time
+
+import groq
+
+RETRYABLE_STATUS = {429, 503}
+# Assumed wait when the daily quota is used up but no reset time was sent
+DEFAULT_DAILY_RESET_SECONDS = 3600.0
+
+
+class DailyLimitExceeded(Exception):
+    """Raised instead of waiting when the provider's daily request quota is used up."""
+
+    def __init__(self, reset_seconds: float):
+        wait = f"{max(1, round(reset_seconds))} s" if reset_seconds < 60 else f"{round(reset_seconds / 60)} min"
+        super().__init__(f"The daily AI request quota is used up; it resets in about {wait}.")
+        self.reset_seconds = reset_seconds
+
+
+class TokenBucket:
+    """Refills continuously at capacity-per-minute; take() blocks until enough is available."""
+
+    def __init__(self, per_minute: float):
+        self.capacity = float(per_minute)
+        self.rate = self.capacity / 60.0
+        self.level = self.capacity
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def _refill(self, now: float):
+        self.level = min(self.capacity, self.level + (now - self._updated) * self.rate)
+        self._updated = now
+
+    def take(self, amount: float = 1.0):
+        # Never ask for more than a full bucket, or a huge prompt would wait forever
+        amount = min(amount, self.capacity)
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self._refill(now)
+                if self.level >= amount:
+                    self.level -= amount
+                    return
+                wait = (amount - self.level) / self.rate
+            time.sleep(min(wait, 5.0))
+
+    def fill_ratio(self) -> float:
+        """Fraction of the bucket currently available (0.0 when empty or in debt)."""
+        with self._lock:
+            self._refill(time.monotonic())
+            return max(0.0, self.level / self.capacity)
+
+    def debit(self, amount: float):
+        """Charge usage after the fact (may go negative, delaying later callers)."""
+        with self._lock:
+            self._refill(time.monotonic())
+            self.level -= amount
+
+    def sync(self, remaining: float, reset_seconds: float | None):
+        """Align the bucket with what the provider says is left."""
+        with self._lock:
+            now = time.monotonic()
+            self._refill(now)
+            self.level = min(self.level, remaining)
+            if remaining <= 0 and reset_seconds:
+                # Empty until the provider's window resets
+                self.level = -reset_seconds * self.rate
+
+
+def parse_duration(value: str | None) -> float | None:
+    """Parse Groq reset values such as '2m59.56s', '7.66s', '320ms' or a bare number of seconds."""
+    if not value:
+        return None
+    value = value.strip()
+    try:
+        return float(value)
+    except ValueError:
+        pass
+    total = 0.0
+    matched = False
+    for amount, unit in re.findall(r"([\d.]+)(ms|h|m|s)", value):
+        matched = True
+        total += float(amount) * {"h": 3600, "m": 60, "s": 1, "ms": 0.001}[unit]
+    return total if matched else None
+
+
+def estimate_tokens(messages: list[dict]) -> int:
+    """Cheap prompt-size estimate (~4 characters per token) for budgeting before a call."""
+    return sum(len(str(m.get("content", ""))) for m in messages) // 4 + 4 * len(messages)
+
+
+class RateLimiter:
+    """
+    Wraps upstream calls: waits for RPM/TPM budget, retries retryable
+    failures with full-jitter exponential backoff (honouring retry-after),
+    and re-syncs the buckets from response headers.
+    """
+
+    def __init__(self, rpm: float, tpm: float | None = None, max_retries: int = 4,
+                 base_delay: float = 0.5, max_delay: float = 20.0):
+        self.requests = TokenBucket(rpm)
+        self.tokens = TokenBucket(tpm) if tpm else None
+        self.max_retries = max_retries
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self._lock = threading.Lock()
+        self._daily_reset_at = 0.0  # monotonic time the exhausted daily quota resets
+        self._stats = {"calls": 0, "retries": 0, "rate_limited": 0, "daily_limited": 0, "waited_seconds": 0.0}
+
+    def update_from_headers(self, headers):
+        if headers is None:
+            return
+        # Requests per day: tracked separately so it never drains the per-minute bucket
+        remaining = headers.get("x-ratelimit-remaining-requests")
+        if remaining is not None:
+            reset = parse_duration(headers.get("x-ratelimit-reset-requests"))
+            with self._lock:
+                if float(remaining) <= 0 and (reset is None or reset > self.max_delay):
+                    # Too long to wait out: fail fast until the quota resets
+                    self._daily_reset_at = time.monotonic() + (reset or DEFAULT_DAILY_RESET_SECONDS)
+                else:
+                    self._daily_reset_at = 0.0
+        remaining = headers.get("x-ratelimit-remaining-tokens")
+        if remaining is not None and self.tokens is not None:
+            self.tokens.sync(float(remaining), parse_duration(headers.get("x-ratelimit-reset-tokens")))
+
+    def _backoff(self, attempt: int, headers) -> float:
+        retry_after = parse_duration(headers.get("retry-after")) if headers is not None else None
+        if retry_after is None and headers is not None and float(headers.get("x-ratelimit-remaining-requests", 1)) <= 0:
+            # Out of requests with a reset short enough to wait for (see update_from_headers)
+            retry_after = parse_duration(headers.get("x-ratelimit-reset-requests"))
+        if retry_after is not None:
+            # Small jitter so waiters released together don't stampede
+            return retry_after + random.uniform(0, self.base_delay)
+        return random.uniform(0, min(self.max_delay, self.base_delay * 2 ** attempt))
+
+    def _check_daily(self):
+        with self._lock:
+            left = self._daily_reset_at - time.monotonic()
+            if left > 0:
+                self._stats["daily_limited"] += 1
+        if left > 0:
+            raise DailyLimitExceeded(left)
+
+    def call(self, fn, est_tokens: int = 0):
+        """
+        Run fn() under the limiter. fn must return the raw response
+        (client...with_raw_response.create(...)) so its headers can be read.
+        Raises DailyLimitExceeded while the daily request quota is used up.
+        """
+        attempt = 0
+        while True:
+            self._check_daily()
+            started = time.monotonic()
+            self.requests.take(1)
+            if self.tokens is not None and est_tokens:
+                self.tokens.take(est_tokens)
+            waited = time.monotonic() - started
+            with self._lock:
+                self._stats["calls"] += 1
+                self._stats["waited_seconds"] += waited
+            try:
+                raw = fn()
+            except groq.APIStatusError as e:
+                if e.status_code not in RETRYABLE_STATUS or attempt >= self.max_retries:
+                    raise
+                headers = e.response.headers
+                self.update_from_headers(headers)
+                # A 429 for a quota that resets beyond max_delay would otherwise sleep until then
+                self._check_daily()
+                with self._lock:
+                    self._stats["retries"] += 1
+                    self._stats["rate_limited"] += e.status_code == 429
+                time.sleep(self._backoff(attempt, headers))
+                attempt += 1
+                continue
+            self.update_from_headers(getattr(raw, "headers", None))
+            return raw
+
+    def record_usage(self, completion_tokens: int):
+        """Charge completion tokens once they are known."""
+        if self.tokens is not None and completion_tokens:
+            self.tokens.debit(completion_tokens)
+
+    def headroom(self) -> float:
+        """Lowest fill ratio across the request and token buckets."""
+        ratio = self.requests.fill_ratio()
+        if self.tokens is not None:
+            ratio = min(ratio, self.tokens.fill_ratio())
+        return ratio
+
+    def stats(self) -> dict:
+        with self._lock:
+            return dict(self._stats)
@@ -0,0 +1,148 @@
+"""
+spaced_repetition.py — SM-2 review scheduling for saved flashcards
+Per-card review state (ease, interval, repetitions, lapses, due time) lives
+in parallel typed arrays, one row per card, and a heap of (due, row) pairs
+indexes them, so the next due card is found in O(log n) however many cards
+are loaded. Rows come from and go back to database.py's flashcard_reviews table.
+"""
+
+import heapq
+import time
+from array import array
+from datetime import datetime, timezone
+
+DEFAULT_EASE = 2.5
+MIN_EASE = 1.3
+DAY = 86400.0
+# A forgotten card comes back this many seconds later in the same session
+RELEARN_SECONDS = 600.0
+
+# Answer buttons: label -> SM-2 quality (0-5)
+GRADES = {"Again": 1, "Hard": 3, "Good": 4, "Easy": 5}
+
+
+def parse_timestamp(value) -> float:
+    """Epoch seconds from a Supabase timestamp string (or a number); missing means due now."""
+    if value is None or value == "":
+        return time.time()
+    if isinstance(value, (int, float)):
+        return float(value)
+    return datetime.fromisoformat(str(value).replace("Z", "+00:00")).timestamp()
+
+
+def format_timestamp(seconds: float) -> str:
+    return datetime.fromtimestamp(seconds, tz=timezone.utc).isoformat()
+
+
+def sm2(ease: float, interval: float, repetitions: int, quality: int) -> tuple[float, float, int]:
+    """
+    One SM-2 step. Returns (ease, interval_days, repetitions); interval 0
+    means the card was forgotten and is relearned within the session.
+    """
+    if quality < 3:
+        return ease, 0.0, 0
+    if repetitions == 0:
+        interval = 1.0
+    elif repetitions == 1:
+        interval = 6.0
+    else:
+        interval = round(interval * ease)
+    ease = max(MIN_EASE, ease + 0.1 - (5 - quality) * (0.08 + (5 - quality) * 0.02))
+    return ease, interval, repetitions + 1
+
+
+class ReviewQueue:
+    """
+    Review state for one user's loaded cards, keyed by (set_id, card_index).
+    Updating a card pushes a fresh heap entry; outdated entries are skipped
+    when they surface, so no heap search is ever needed.
+    """
+
+    def __init__(self):
+        self.keys: list[tuple[str, int]] = []
+        self._rows: dict[tuple[str, int], int] = {}
+        self.ease = array("f")
+        self.interval = array("f")  # days
+        self.repetitions = array("H")
+        self.lapses = array("H")
+        self.due = array("d")  # epoch seconds
+        self._heap: list[tuple[float, int]] = []
+
+    def __len__(self) -> int:
+        return len(self.keys)
+
+    @classmethod
+    def from_rows(cls, rows: list[dict]) -> "ReviewQueue":
+        """Build a queue from flashcard_reviews rows."""
+        queue = cls()
+        for r in rows:
+            queue.add(r["set_id"], int(r["card_index"]), ease=float(r.get("ease") or DEFAULT_EASE),
+                      interval=float(r.get("interval_days") or 0), repetitions=int(r.get("repetitions") or 0),
+                      lapses=int(r.get("lapses") or 0), due=parse_timestamp(r.get("due_at")))
+        return queue
+
+    def add(self, set_id: str, card_index: int, ease: float = DEFAULT_EASE, interval: float = 0.0,
+            repetitions: int = 0, lapses: int = 0, due: float | None = None) -> int:
+        """Load a card's state (a new card is due now); returns its row."""
+        key = (set_id, card_index)
+        due = time.time() if due is None else due
+        row = self._rows.get(key)
+        if row is None:
+            row = self._rows[key] = len(self.keys)
+            self.keys.append(key)
+            for column in (self.ease, self.interval, self.repetitions, self.lapses, self.due):
+                column.append(0)
+        self.ease[row], self.interval[row] = ease, interval
+        self.repetitions[row], self.lapses[row], self.due[row] = repetitions, lapses, due
+        heapq.heappush(self._heap, (due, row))
+        return row
+
+    def _drop_stale(self):
+        # An entry is stale once its row was rescheduled to another time
+        while self._heap and self._heap[0][0] != self.due[self._heap[0][1]]:
+            heapq.heappop(self._heap)
+
+    def next_due(self, now: float | None = None) -> int | None:
+        """Row of the card due soonest if it is due by now, else None."""
+        self._drop_stale()
+        if not self._heap:
+            return None
+        due, row = self._heap[0]
+        return row if due <= (time.time() if now is None else now) else None
+
+    def next_due_time(self) -> float | None:
+        """When the earliest loaded card is due (None if nothing is loaded)."""
+        self._drop_stale()
+        return self._heap[0][0] if self._heap else None
+
+    def due_count(self, now: float | None = None) -> int:
+        now = time.time() if now is None else now
+        return sum(d <= now for d in self.due)
+
+    def review(self, row: int, quality: int, now: float | None = None) -> dict:
+        """Apply an answer (SM-2 quality 0-5) to a card and return its new state row for saving."""
+        now = time.time() if now is None else now
+        ease, interval, repetitions = sm2(self.ease[row], self.interval[row], self.repetitions[row], quality)
+        self.ease[row], self.interval[row], self.repetitions[row] = ease, interval, repetitions
+        if quality < 3:
+            self.lapses[row] = min(self.lapses[row] + 1, 0xFFFF)
+        self.due[row] = now + (interval * DAY if interval else RELEARN_SECONDS)
+        heapq.heappush(self._heap, (self.due[row], row))
+        return self.state(row)
+
+    def skip(self, row: int):
+        """Drop a card from this session (e.g. its set was deleted); its stored state is unchanged."""
+        self.due[row] = float("inf")
+
+    def state(self, row: int) -> dict:
+        """A card's state as a flashcard_reviews row (without user_id)."""
+        set_id, card_index = self.keys[row]
+        return {
+            "set_id": set_id,
+            "card_index": card_index,
+            "ease": round(float(self.ease[row]), 3),
+            "interval_days": float(self.interval[row]),
+            "repetitions": int(self.repetitions[row]),
+            "lapses": int(self.lapses[row]),
+            "due_at": format_timestamp(self.due[row]),
+        }
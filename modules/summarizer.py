@@ -1,37 +1,274 @@
+import hashlib
 import io
-import PyPDF2
-from modules.llm_engine import generate
-
-def extract_text_from_pdf(uploaded_file) -> str:
-    """Extract raw text from an uploaded PDF file."""
-    try:
-        # Reset file pointer to beginning to avoid empty reads on reruns
-        if hasattr(uploaded_file, "seek"):
-            uploaded_file.seek(0)
-            
-        reader = PyPDF2.PdfReader(uploaded_file)
-        text = ""
-        for page in reader.pages:
-            extracted = page.extract_text()
-            if extracted:
-                text += extracted + "\n"
-        return text.strip()
-    except Exception as e:
-        return f"Error reading PDF: {e}"
-
-def summarize_notes(text: str) -> str:
-    """Summarize study notes and extract key points and terms."""
+import os
+import re
+import sqlite3
+import time
+from modules.llm_cache import MemoryLRU, SQLiteCache, TieredCache, make_key
+from modules.compressor import fit_or_compress
+from modules.pdf_extract import extract_pdf
+from modules.llm_engine import (
+    generate, generate_many, generate_stream, fit_to_budget, input_budget, count_tokens, resolve_route,
+)
+
+# Long documents are summarized map-reduce style: chunks of at most this many
+# tokens are condensed in parallel, then the partial notes are merged.
+CHUNK_TOKENS = int(os.getenv("SUMMARY_CHUNK_TOKENS", 3000))
+# Notes up to this many times the summarize budget are condensed locally into
+# one request instead; longer ones keep more detail through map-reduce.
+COMPRESS_MAX_RATIO = float(os.getenv("SUMMARY_COMPRESS_MAX_RATIO", 3))
+_PARAGRAPH_SPLIT = re.compile(r"\n\s*\n")
+# A chunk may end after any paragraph whose hash is divisible by this, once it
+# holds half of CHUNK_TOKENS, so boundaries depend only on nearby text
+_BOUNDARY_MODULUS = 4
+
+def _build_chunk_store() -> TieredCache | None:
+    """Chunk summaries keyed by chunk content; SUMMARY_CHUNK_CACHE_PATH= (empty) keeps them in memory only."""
+    if os.getenv("LLM_CACHE_DISABLED", "").lower() in ("1", "true", "yes"):
+        return None
+    ttl = float(os.getenv("SUMMARY_CHUNK_CACHE_TTL", 30 * 24 * 3600))
+    memory = MemoryLRU(max_entries=int(os.getenv("SUMMARY_CHUNK_MEMORY_ENTRIES", 512)), ttl=ttl)
+    path = os.getenv("SUMMARY_CHUNK_CACHE_PATH", ".cache/summary_chunks.sqlite3")
+    disk = None
+    if path:
+        try:
+            disk = SQLiteCache(path, ttl=ttl, max_entries=int(os.getenv("SUMMARY_CHUNK_MAX_ENTRIES", 20000)))
+        except (sqlite3.Error, OSError) as e:
+            print(f"Summary chunk store unavailable: {e}")
+    return TieredCache(memory, disk)
+
+_chunk_store = _build_chunk_store()
+
+def chunk_store_stats() -> dict:
+    """Hit/miss counters of the chunk summary store (hits are chunks that were not re-summarized)."""
+    return _chunk_store.stats() if _chunk_store is not None else {}
+
+def read_pdf(uploaded_file, pages: str = "") -> dict:
+    """
+    Extract an uploaded PDF in the sandboxed worker pool (see pdf_extract).
+    Returns {"text", "pages", "status", "message"}; when a time, memory or
+    page limit is hit, text holds the pages read before it.
+    """
+    return extract_pdf(uploaded_file, pages or None)
+
+def extract_text_from_pdf(uploaded_file, pages: str = "") -> str:
+    """
+    Extract raw text from an uploaded PDF file.
+    pages is an optional 1-based range like "1-20, 35"; large documents are
+    extracted page-parallel and per-page text is cached (see pdf_extract).
+    """
+    result = read_pdf(uploaded_file, pages)
+    if result["status"] == "error" or not result["pages"] and result["status"] != "ok":
+        return f"Error reading PDF: {result['message']}"
+    return result["text"]
+
+def _build_prompt(text: str) -> tuple[str, str]:
+    """Return the (system, prompt) pair for summarizing study notes."""
     system = (
         "You are an expert academic summarizer. Your job is to condense study material "
         "into clear, structured summaries that help students retain information efficiently. "
         "Always use markdown formatting."
     )
     prompt = (
-        f"Here are the study notes to summarize:\n\n---\n{text[:6000]}\n---\n\n"
+        f"Here are the study notes to summarize:\n\n---\n{text}\n---\n\n"
         "Please provide:\n"
         "## 📝 Summary\n(A concise 3-5 sentence overview)\n\n"
         "## 🔑 Key Points\n(Bullet list of the most important takeaways)\n\n"
         "## 📚 Important Terms & Definitions\n(A brief glossary of key terms)\n\n"
         "## 💡 Study Tips\n(2-3 actionable tips for mastering this material)"
     )
-    return generate(prompt, system_prompt=system, temperature=0.4)
+    return system, prompt
+
+def fit_notes(text: str) -> tuple[str, dict]:
+    """Fit notes to the summarize route, condensing moderately long ones locally; the report says how."""
+    system, template = _build_prompt("")
+    return fit_or_compress(text, task="summarize", system_prompt=system, template=template,
+                           max_ratio=COMPRESS_MAX_RATIO)
+
+def _build_map_prompt(chunk: str) -> tuple[str, str]:
+    """
+    Return the (system, prompt) pair that condenses one section of a long document.
+    The prompt depends only on the chunk, so unchanged chunks reuse their stored summary.
+    """
+    system = (
+        "You are an expert academic note-taker. Condense a section of a longer document "
+        "into dense notes that keep every important fact, term and definition."
+    )
+    prompt = (
+        f"Section of a longer document:\n\n---\n{chunk}\n---\n\n"
+        "Write compact markdown bullet notes covering the key points, "
+        "and list key terms with one-line definitions. No introduction or conclusion."
+    )
+    return system, prompt
+
+def _build_combine_prompt(notes: str) -> tuple[str, str]:
+    """Return the (system, prompt) pair that merges several partial notes into one."""
+    system = (
+        "You are an expert academic note-taker. Merge partial notes from consecutive "
+        "sections of one document into a single set of notes without losing key facts."
+    )
+    prompt = (
+        f"Partial notes:\n\n---\n{notes}\n---\n\n"
+        "Merge them into compact markdown bullet notes, removing repetition, "
+        "and keep a combined list of key terms with one-line definitions."
+    )
+    return system, prompt
+
+def _normalize(text: str) -> str:
+    return " ".join(text.split())
+
+def _is_boundary(paragraph: str) -> bool:
+    digest = hashlib.blake2b(_normalize(paragraph).encode("utf-8"), digest_size=4).digest()
+    return int.from_bytes(digest, "little") % _BOUNDARY_MODULUS == 0
+
+def _paragraph_units(text: str, max_tokens: int) -> list[tuple[str, int]]:
+    """Paragraphs with their token counts; one longer than max_tokens is cut at sentence boundaries."""
+    units = []
+    for paragraph in _PARAGRAPH_SPLIT.split(text):
+        paragraph = paragraph.strip()
+        n = count_tokens(paragraph)
+        while n > max_tokens:
+            head, _ = fit_to_budget(paragraph, budget=max_tokens)
+            if not head:
+                break
+            units.append((head, count_tokens(head)))
+            paragraph = paragraph[len(head):].strip()
+            n = count_tokens(paragraph)
+        if paragraph:
+            units.append((paragraph, n))
+    return units
+
+def split_chunks(text: str, max_tokens: int = CHUNK_TOKENS) -> list[str]:
+    """
+    Split text into chunks of at most max_tokens made of whole paragraphs.
+    Chunks end at content-defined paragraphs rather than at a fixed size, so
+    editing one part of the notes leaves the other chunks byte-identical.
+    """
+    chunks, current, used = [], [], 0
+    for paragraph, n in _paragraph_units(text, max_tokens):
+        if current and used + n > max_tokens:
+            chunks.append("\n\n".join(current))
+            current, used = [], 0
+        current.append(paragraph)
+        used += n
+        if used >= max_tokens // 2 and _is_boundary(paragraph):
+            chunks.append("\n\n".join(current))
+            current, used = [], 0
+    if current:
+        chunks.append("\n\n".join(current))
+    return chunks
+
+def _chunk_key(chunk: str) -> str:
+    # Covers the prompt wording and model too, so changing either re-summarizes
+    return make_key(kind="summary_chunk", prompt=_build_map_prompt(""),
+                    model=resolve_route("summarize:map")["model"], text=_normalize(chunk))
+
+def _summarize_chunks(chunks: list[str], on_progress=None) -> list[str]:
+    """Chunk summaries in order, reusing stored ones and condensing only new or edited chunks."""
+    keys = [_chunk_key(chunk) for chunk in chunks]
+    partials = [None] * len(chunks)
+    if _chunk_store is not None:
+        for i, key in enumerate(keys):
+            hit = _chunk_store.get(key)
+            if hit is not None:
+                partials[i] = hit["text"]
+    missing = [i for i, partial in enumerate(partials) if partial is None]
+    reused = len(chunks) - len(missing)
+    if on_progress and reused:
+        on_progress("map", reused, len(chunks))
+
+    def _report(stage, done, _total):
+        if on_progress:
+            on_progress(stage, done if stage == "skipped" else reused + done, len(chunks))
+
+    if missing:
+        started = time.monotonic()
+        results = _map([_build_map_prompt(chunks[i]) for i in missing], "map", _report, keep_failed=True)
+        latency = (time.monotonic() - started) / len(missing)
+        for i, text in zip(missing, results):
+            partials[i] = text
+            if text and _chunk_store is not None:
+                _chunk_store.set(keys[i], {"text": text, "latency": latency})
+    return [partial for partial in partials if partial]
+
+def _map(prompts: list[tuple[str, str]], stage: str, on_progress=None, keep_failed: bool = False) -> list:
+    """
+    Run (system, prompt) pairs through generate_many(), keeping successful results in order.
+    Failed items are retried once; any still failing are reported as
+    on_progress("skipped", failed, total) so callers can flag the summary as partial.
+    keep_failed leaves None in place of failures so results line up with prompts.
+    """
+    done = 0
+
+    def _report(_result):
+        nonlocal done
+        done += 1
+        if on_progress:
+            on_progress(stage, done, len(prompts))
+
+    requests = [{"prompt": prompt, "system_prompt": system} for system, prompt in prompts]
+    results = generate_many(requests, temperature=0.3, task="summarize:map", on_result=_report)
+    failed = [i for i, r in enumerate(results) if not r["text"]]
+    if failed:
+        retried = generate_many([requests[i] for i in failed], temperature=0.3, task="summarize:map")
+        for i, r in zip(failed, retried):
+            if r["text"]:
+                results[i] = r
+        still_failed = sum(1 for r in results if not r["text"])
+        if still_failed and on_progress and still_failed < len(results):
+            on_progress("skipped", still_failed, len(prompts))
+    texts = [r["text"] for r in results if r["text"]]
+    if not texts:
+        errors = [r["error"] for r in results if r["error"] is not None]
+        if errors:
+            raise errors[0]
+    return [r["text"] for r in results] if keep_failed else texts
+
+
+def _reduce(partials: list[str], budget: int, on_progress=None) -> str:
+    """Merge partial notes in groups until they fit one final summarize request."""
+    joined = "\n\n".join(partials)
+    rounds = 0
+    while count_tokens(joined) > budget and len(partials) > 1:
+        combine_budget = input_budget("summarize:map", *_build_combine_prompt(""))
+        groups, current, used = [], [], 0
+        for partial in partials:
+            n = count_tokens(partial)
+            if current and used + n > combine_budget:
+                groups.append(current)
+                current, used = [], 0
+            current.append(partial)
+            used += n
+        groups.append(current)
+        rounds += 1
+        partials = _map([_build_combine_prompt("\n\n".join(group)) for group in groups],
+                        f"reduce {rounds}", on_progress)
+        joined = "\n\n".join(partials)
+    return fit_to_budget(joined, budget=budget)[0]
+
+def _prepare(text: str, on_progress=None, fitted: tuple[str, dict] | None = None) -> tuple[str, str]:
+    """Build the final (system, prompt) pair, condensing long notes map-reduce style first."""
+    content, report = fitted or fit_notes(text)
+    if not report["truncated"]:
+        return _build_prompt(content)
+    partials = _summarize_chunks(split_chunks(text), on_progress)
+    notes = _reduce(partials, report["budget"], on_progress)
+    return _build_prompt(notes)
+
+def summarize_notes(text: str, on_progress=None, fitted: tuple[str, dict] | None = None) -> str:
+    """
+    Summarize study notes and extract key points and terms.
+    Notes longer than one request are split into chunks, condensed in parallel
+    and merged; on_progress(stage, done, total) reports each finished chunk, and
+    stage "skipped" reports sections that failed twice and are left out.
+    fitted is fit_notes(text) when the caller already has it, so the notes aren't fitted twice.
+    """
+    system, prompt = _prepare(text, on_progress, fitted)
+    return generate(prompt, system_prompt=system, temperature=0.4, task="summarize")
+
+def summarize_notes_stream(text: str, cancel_event=None, on_progress=None,
+                           fitted: tuple[str, dict] | None = None):
+    """Streaming variant of summarize_notes(): yields markdown tokens of the final summary as they arrive."""
+    system, prompt = _prepare(text, on_progress, fitted)
+    yield from generate_stream(prompt, system_prompt=system, temperature=0.4, cancel_event=cancel_event,
+                               task="summarize")
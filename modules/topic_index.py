@@ -0,0 +1,220 @@
+"""
+topic_index.py — Near-duplicate topic matching for cached explanations
+Topics are canonicalized (case, spacing, filler like "explain ..."), then
+compared by MinHash over character shingles with LSH banding, so
+"Quantum entanglement", "quantum  Entanglement " and "explain quantum
+entanglement" all map to the same cached explanation for a level.
+Shingle similarity only finds candidates: a match also needs the same words
+(one typo per word allowed), so "inorganic chemistry" never gets the
+"organic chemistry" explanation.
+"""
+
+import hashlib
+import random
+import re
+import threading
+import unicodedata
+from collections import OrderedDict
+
+# Request phrasing that doesn't change what is being asked about
+_FILLER_PREFIX = re.compile(
+    r"^(?:(?:please|can you|could you|help me)\s+)*"
+    r"(?:explain|describe|define|teach me|tell me about|what is|what are|what's|whats|how does|how do|"
+    r"overview of|intro to|introduction to)\s+",
+)
+_ARTICLE_PREFIX = re.compile(r"^(?:the|a|an)\s+")
+_NON_WORD = re.compile(r"[^\w\s]")
+_NUMBER = re.compile(r"\d+")
+# Words that don't change the topic when added or dropped
+_FILLER_WORDS = frozenset("the a an of in on to for and about is are".split())
+# Prefixes that turn a word into its opposite or a different concept ("aerobic" vs "anaerobic")
+_CONTRAST_PREFIXES = ("a", "an", "in", "im", "il", "ir", "un", "non", "dis", "de", "anti", "counter",
+                      "endo", "exo", "hyper", "hypo", "intra", "inter", "pre", "post", "sub", "super")
+# Shortest word that may carry a typo and still match
+_MIN_TYPO_LENGTH = 5
+
+_MERSENNE_PRIME = (1 << 61) - 1
+_MAX_HASH = (1 << 32) - 1
+
+
+def canonicalize_topic(topic: str) -> str:
+    """Normalize a topic string: NFKC, lowercase, punctuation and filler phrases removed, spaces collapsed."""
+    text = unicodedata.normalize("NFKC", topic).lower()
+    text = _NON_WORD.sub(" ", text)
+    text = " ".join(text.split())
+    text = _FILLER_PREFIX.sub("", text)
+    text = _ARTICLE_PREFIX.sub("", text)
+    return " ".join(text.split())
+
+
+def _content_words(text: str) -> set[str]:
+    words = text.split()
+    return {w for w in words if w not in _FILLER_WORDS} or set(words)
+
+
+def _one_edit_apart(a: str, b: str) -> bool:
+    """True if one insertion, deletion or substitution turns a into b."""
+    if len(a) > len(b):
+        a, b = b, a
+    if len(b) - len(a) > 1:
+        return False
+    start = 0
+    while start < len(a) and a[start] == b[start]:
+        start += 1
+    skip = 1 if len(a) == len(b) else 0
+    return a[start + skip:] == b[start + 1:]
+
+
+def _contrast_prefixed(a: str, b: str) -> bool:
+    """True if a and b share a stem but differ by a prefix like in-/an-/endo-/exo-."""
+    for prefix_a in ("",) + _CONTRAST_PREFIXES:
+        if not a.startswith(prefix_a):
+            continue
+        for prefix_b in ("",) + _CONTRAST_PREFIXES:
+            if prefix_a != prefix_b and b.startswith(prefix_b) and len(a) - len(prefix_a) >= 3 \
+                    and a[len(prefix_a):] == b[len(prefix_b):]:
+                return True
+    return False
+
+
+def _typo_of(a: str, b: str) -> bool:
+    return (min(len(a), len(b)) >= _MIN_TYPO_LENGTH and _one_edit_apart(a, b)
+            and not _contrast_prefixed(a, b))
+
+
+def same_words(a: str, b: str) -> bool:
+    """
+    True if two canonical texts use the same words after filler removal, in any
+    order, allowing one typo per word; "exothermic reactions" vs "endothermic
+    reactions" or "mitosis" vs "meiosis" are different.
+    """
+    words_a, words_b = _content_words(a), _content_words(b)
+    if len(words_a) != len(words_b):
+        return False
+    left_b = sorted(words_b - words_a)
+    for word in sorted(words_a - words_b):
+        match = next((other for other in left_b if _typo_of(word, other)), None)
+        if match is None:
+            return False
+        left_b.remove(match)
+    return True
+
+
+def shingles(text: str, k: int = 3) -> set[str]:
+    """Character k-shingles of the text (padded so short topics still get a few)."""
+    padded = f" {text} "
+    if len(padded) <= k:
+        return {padded}
+    return {padded[i:i + k] for i in range(len(padded) - k + 1)}
+
+
+class MinHasher:
+    """MinHash signatures from num_perm universal hash functions over 32-bit shingle hashes."""
+
+    def __init__(self, num_perm: int = 64, seed: int = 7):
+        rng = random.Random(seed)
+        self.num_perm = num_perm
+        self._params = [(rng.randrange(1, _MERSENNE_PRIME), rng.randrange(0, _MERSENNE_PRIME))
+                        for _ in range(num_perm)]
+
+    def signature(self, items: set[str]) -> tuple[int, ...]:
+        hashed = [int.from_bytes(hashlib.blake2b(s.encode("utf-8"), digest_size=4).digest(), "little")
+                  for s in items]
+        return tuple(
+            min(((a * h + b) % _MERSENNE_PRIME) & _MAX_HASH for h in hashed)
+            for a, b in self._params
+        )
+
+    @staticmethod
+    def similarity(sig_a: tuple[int, ...], sig_b: tuple[int, ...]) -> float:
+        """Estimated Jaccard similarity between the two shingle sets."""
+        return sum(x == y for x, y in zip(sig_a, sig_b)) / len(sig_a)
+
+
+class TopicIndex:
+    """
+    Bounded LRU index of recently explained topics per level.
+    lookup() returns the stored explanation for an exact canonical match or
+    a near-duplicate above the similarity threshold that has the same words.
+    """
+
+    def __init__(self, threshold: float = 0.8, max_entries: int = 500, num_perm: int = 64, bands: int = 16):
+        if num_perm % bands:
+            raise ValueError("num_perm must be divisible by bands")
+        self.threshold = threshold
+        self.max_entries = max_entries
+        self.bands = bands
+        self.rows = num_perm // bands
+        self._hasher = MinHasher(num_perm)
+        self._entries: OrderedDict[tuple[str, str], dict] = OrderedDict()
+        self._buckets: dict[tuple, set] = {}
+        self._lock = threading.Lock()
+        self._stats = {"lookups": 0, "exact_hits": 0, "near_hits": 0, "misses": 0}
+
+    def _band_keys(self, level: str, signature: tuple[int, ...]) -> list[tuple]:
+        return [(level, band, signature[band * self.rows:(band + 1) * self.rows]) for band in range(self.bands)]
+
+    def _remove(self, entry_key: tuple[str, str]):
+        entry = self._entries.pop(entry_key)
+        for band_key in self._band_keys(entry_key[0], entry["signature"]):
+            bucket = self._buckets.get(band_key)
+            if bucket is not None:
+                bucket.discard(entry_key)
+                if not bucket:
+                    del self._buckets[band_key]
+
+    def lookup(self, topic: str, level: str) -> str | None:
+        canonical = canonicalize_topic(topic)
+        with self._lock:
+            self._stats["lookups"] += 1
+            entry = self._entries.get((level, canonical))
+            if entry is not None:
+                self._entries.move_to_end((level, canonical))
+                self._stats["exact_hits"] += 1
+                return entry["explanation"]
+
+        signature = self._hasher.signature(shingles(canonical))
+        numbers = set(_NUMBER.findall(canonical))
+        with self._lock:
+            candidates = set()
+            for band_key in self._band_keys(level, signature):
+                candidates |= self._buckets.get(band_key, set())
+            best_key, best_score = None, 0.0
+            for key in candidates:
+                entry = self._entries[key]
+                # "World War 1" vs "World War 2" look alike but are different topics
+                if entry["numbers"] != numbers or not same_words(canonical, key[1]):
+                    continue
+                score = MinHasher.similarity(signature, entry["signature"])
+                if score > best_score:
+                    best_key, best_score = key, score
+            if best_key is not None and best_score >= self.threshold:
+                self._entries.move_to_end(best_key)
+                self._stats["near_hits"] += 1
+                return self._entries[best_key]["explanation"]
+            self._stats["misses"] += 1
+            return None
+
+    def add(self, topic: str, level: str, explanation: str):
+        canonical = canonicalize_topic(topic)
+        signature = self._hasher.signature(shingles(canonical))
+        entry_key = (level, canonical)
+        with self._lock:
+            if entry_key in self._entries:
+                self._remove(entry_key)
+            self._entries[entry_key] = {
+                "signature": signature,
+                "numbers": set(_NUMBER.findall(canonical)),
+                "explanation": explanation,
+            }
+            for band_key in self._band_keys(level, signature):
+                self._buckets.setdefault(band_key, set()).add(entry_key)
+            while len(self._entries) > self.max_entries:
+                self._remove(next(iter(self._entries)))
+
+    def stats(self) -> dict:
+        with self._lock:
+            stats = dict(self._stats, entries=len(self._entries), threshold=self.threshold)
+        hits = stats["exact_hits"] + stats["near_hits"]
+        stats["hit_rate"] = hits / stats["lookups"] if stats["lookups"] else 0.0
+        return stats
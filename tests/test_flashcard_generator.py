@@ -0,0 +1,18 @@
+from modules.flashcard_generator import _dedup_fronts
+
+
+def _card(front):
+    return {"front": front, "back": "..."}
+
+
+def test_contrast_cards_are_kept():
+    per_chunk = [[_card("Primary function of red blood cells")],
+                 [_card("Primary function of white blood cells"), _card("What happens in mitosis?")],
+                 [_card("What happens in meiosis?")]]
+    assert [len(cards) for cards in _dedup_fronts(per_chunk)] == [1, 2, 1]
+
+
+def test_repeated_front_is_dropped_from_later_chunk():
+    per_chunk = [[_card("What is osmosis?")], [_card("what is Osmosis"), _card("Define diffusion")]]
+    assert [[c["front"] for c in cards] for cards in _dedup_fronts(per_chunk)] == [
+        ["What is osmosis?"], ["Define diffusion"]]
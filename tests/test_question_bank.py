@@ -0,0 +1,26 @@
+import pytest
+
+from modules.question_bank import QuestionBank
+
+DIFFERENT_QUESTIONS = [
+    ("True or False: Mitosis produces two identical daughter cells.",
+     "True or False: Meiosis produces two identical daughter cells."),
+    ("What is the primary function of red blood cells?",
+     "What is the primary function of white blood cells?"),
+    ("In which year did World War 1 begin?", "In which year did World War 2 begin?"),
+]
+
+
+@pytest.mark.parametrize("first, second", DIFFERENT_QUESTIONS)
+def test_questions_differing_in_one_term_are_both_kept(first, second):
+    bank = QuestionBank()
+    ids = bank.add("cells", "MCQ", [{"question": first}, {"question": second}])
+    assert ids[0] != ids[1]
+
+
+def test_rephrased_duplicate_is_dropped():
+    bank = QuestionBank()
+    ids = bank.add("cells", "MCQ", [{"question": "What is the function of the mitochondria?"},
+                                    {"question": "What is the function of mitochondria"}])
+    assert ids[0] == ids[1]
+    assert bank.stats()["duplicates"] == 1
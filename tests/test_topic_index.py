@@ -0,0 +1,51 @@
+import pytest
+
+from modules.topic_index import TopicIndex, canonicalize_topic, same_words
+
+OPPOSITE_TOPICS = [
+    ("organic chemistry", "inorganic chemistry"),
+    ("endothermic reactions", "exothermic reactions"),
+    ("aerobic respiration in cells", "anaerobic respiration in cells"),
+    ("hyperthyroidism", "hypothyroidism"),
+    ("mitosis", "meiosis"),
+    ("typical antipsychotics", "atypical antipsychotics"),
+]
+
+SAME_TOPICS = [
+    ("Quantum entanglement", "explain quantum  Entanglement "),
+    ("photosynthesis in plants", "photosynthesis in plant"),
+    ("the krebs cycle", "krebs cycle"),
+    ("mitochondria function", "mitocondria function"),
+    ("cell membrane structure", "structure of the cell membrane"),
+]
+
+
+@pytest.mark.parametrize("stored, asked", OPPOSITE_TOPICS)
+def test_opposite_topics_are_not_the_same_words(stored, asked):
+    assert not same_words(canonicalize_topic(stored), canonicalize_topic(asked))
+    assert not same_words(canonicalize_topic(asked), canonicalize_topic(stored))
+
+
+@pytest.mark.parametrize("stored, asked", OPPOSITE_TOPICS)
+def test_lookup_misses_opposite_topic(stored, asked):
+    index = TopicIndex()
+    index.add(stored, "standard", f"about {stored}")
+    assert index.lookup(asked, "standard") is None
+
+
+@pytest.mark.parametrize("stored, asked", SAME_TOPICS)
+def test_same_topic_rephrasings_match(stored, asked):
+    assert same_words(canonicalize_topic(stored), canonicalize_topic(asked))
+
+
+def test_lookup_reuses_rephrased_topic():
+    index = TopicIndex()
+    index.add("Quantum entanglement", "standard", "explanation")
+    assert index.lookup("explain quantum  Entanglement ", "standard") == "explanation"
+    assert index.lookup("quantum entanglemnt", "standard") == "explanation"
+
+
+def test_lookup_keeps_numbers_apart():
+    index = TopicIndex()
+    index.add("World War 1", "standard", "ww1")
+    assert index.lookup("World War 2", "standard") is None